@@ -0,0 +1,236 @@
+"""HTTP API over post_generator for programmatic clients.
+
+    python api.py --port 8000 --workers 4
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    GET  /tags
+    POST /generate   {length, language, tag, tone, custom_line_count?, use_cache?}
+    POST /rewrite    {text, length, language, tone, custom_line_count?, use_cache?}
+    POST /feedback   {text, use_cache?}
+
+Add ?stream=1 to the POST endpoints for server-sent events: one "chunk" event
+per piece of text, then a "done" event with the parsed result.
+"""
+import argparse
+import json
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import post_generator
+from few_shot import get_few_shot_posts
+from llm_helper import shared_llm
+from post_parser import parse_posts
+from prewarm import get_prewarmer
+from telemetry import span, telemetry
+
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "32"))
+API_MAX_TEXT_CHARS = int(os.getenv("API_MAX_TEXT_CHARS", "20000"))
+
+
+class Admission:
+    """Per-worker cap on in-flight generations; beyond it requests are refused, not queued."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+admission = Admission(API_MAX_CONCURRENCY)
+
+
+class ValidationError(Exception):
+    pass
+
+
+def require_choice(body, field, options):
+    value = body.get(field)
+    if value not in options:
+        raise ValidationError(f"{field} must be one of: {', '.join(options)}")
+    return value
+
+
+def require_text(body, field):
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ValidationError(f"{field} must be a non-empty string")
+    if len(value) > API_MAX_TEXT_CHARS:
+        raise ValidationError(f"{field} must be at most {API_MAX_TEXT_CHARS} characters")
+    return value
+
+
+def require_line_count(body, length):
+    """Same rule as the UI: Custom needs a positive line count, and post_generator caps it at 30."""
+    count = body.get("custom_line_count")
+    if length != "Custom":
+        return None
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        raise ValidationError("custom_line_count must be a positive integer when length is Custom")
+    warning = post_generator.enforce_custom_limit(length, count)
+    if warning:
+        raise ValidationError(warning)
+    return count
+
+
+def generate_args(body):
+    length = require_choice(body, "length", post_generator.LENGTH_OPTIONS)
+    return (
+        length,
+        require_choice(body, "language", post_generator.LANGUAGE_OPTIONS),
+        require_text(body, "tag"),
+        require_choice(body, "tone", post_generator.TONE_OPTIONS),
+        require_line_count(body, length),
+    )
+
+
+def rewrite_args(body):
+    length = require_choice(body, "length", post_generator.LENGTH_OPTIONS)
+    return (
+        require_text(body, "text"),
+        length,
+        require_choice(body, "language", post_generator.LANGUAGE_OPTIONS),
+        require_choice(body, "tone", post_generator.TONE_OPTIONS),
+        require_line_count(body, length),
+    )
+
+
+def feedback_args(body):
+    return (require_text(body, "text"),)
+
+
+def post_result(raw):
+    posts, issues = parse_posts(raw, max_posts=3)
+    return {"raw": raw, "posts": [{"post": p, "image": i, "hashtags": h} for p, i, h in posts], "issues": issues}
+
+
+def text_result(raw):
+    return {"text": raw}
+
+
+# endpoint name -> (argument validator, blocking call, streaming call, result shaper)
+OPERATIONS = {
+    "generate": (generate_args, post_generator.generate_post, post_generator.generate_post_stream, post_result),
+    "rewrite": (rewrite_args, post_generator.rewrite_post, post_generator.rewrite_post_stream, text_result),
+    "feedback": (feedback_args, post_generator.get_feedback, post_generator.get_feedback_stream, text_result),
+}
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def run_operation(request):
+    name = request.url.path.strip("/")
+    validate, call, stream_call, shape = OPERATIONS[name]
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise ValidationError("request body must be a JSON object")
+        args = validate(body)
+    except (ValueError, ValidationError) as e:
+        return JSONResponse({"error": str(e) or "invalid JSON body"}, status_code=422)
+    use_cache = body.get("use_cache", True) is not False
+    stream = request.query_params.get("stream") in ("1", "true")
+
+    # A prewarmed result needs no model call, so it skips admission control
+    pooled = get_prewarmer().take(*args) if name == "generate" else None
+    if pooled is not None:
+        if stream:
+            async def pooled_events():
+                yield sse("chunk", {"text": pooled})
+                yield sse("done", shape(pooled))
+
+            return StreamingResponse(pooled_events(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache"})
+        return JSONResponse(shape(pooled))
+
+    if not admission.try_acquire():
+        return JSONResponse({"error": "server is at capacity, retry shortly"}, status_code=429,
+                            headers={"Retry-After": "1"})
+
+    if stream:
+        async def events():
+            parts = []
+            try:
+                with span(f"api.{name}.stream"):
+                    async for chunk in iterate_in_threadpool(stream_call(*args, use_cache=use_cache)):
+                        parts.append(chunk)
+                        yield sse("chunk", {"text": chunk})
+                raw = "".join(parts).strip()
+                if raw.startswith(post_generator.ERROR_PREFIXES):
+                    yield sse("error", {"error": raw})
+                else:
+                    yield sse("done", shape(raw))
+            finally:
+                admission.release()
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    try:
+        with span(f"api.{name}"):
+            raw = await run_in_threadpool(call, *args, use_cache=use_cache)
+    finally:
+        admission.release()
+    if raw.startswith(post_generator.ERROR_PREFIXES):
+        return JSONResponse({"error": raw}, status_code=502)
+    return JSONResponse(shape(raw))
+
+
+async def tags(request):
+    fs = await run_in_threadpool(get_few_shot_posts)
+    return JSONResponse({"tags": fs.get_tags_by_popularity()})
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "pid": os.getpid(), "in_flight": admission.in_flight,
+                         "rejected": admission.rejected, "prewarm": get_prewarmer().status(),
+                         "stages": telemetry.percentiles()})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the corpus and the model client before the first request instead of during it
+    await run_in_threadpool(get_few_shot_posts)
+    await run_in_threadpool(shared_llm)
+    get_prewarmer()
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/tags", tags),
+        Route("/generate", run_operation, methods=["POST"]),
+        Route("/rewrite", run_operation, methods=["POST"]),
+        Route("/feedback", run_operation, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the post generator over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes; each has its own concurrency limit")
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
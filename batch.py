@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from few_shot import get_few_shot_posts
+from post_generator import generate_post, rewrite_post, ERROR_PREFIXES, LENGTH_OPTIONS, LANGUAGE_OPTIONS, TONE_OPTIONS
+from post_parser import parse_posts
+
+
+
+# Fields each job type needs; "custom_line_count" is optional
+REQUIRED_FIELDS = {
+    "generate": ("tag", "length", "language", "tone"),
+    "rewrite": ("text", "length", "language", "tone"),
+}
+
+
+def job_id(job):
+    """Stable id for a job: its explicit "id", or a hash of its parameters."""
+    if isinstance(job, dict) and "id" in job:
+        return str(job["id"])
+    return hashlib.sha256(json.dumps(job, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def make_jobs(tags=None, lengths=None, languages=None, tones=None):
+    """One generate job for every combination of tag, length, language and tone."""
+    tags = sorted(tags or get_few_shot_posts().get_tags())
+    lengths = lengths or [length for length in LENGTH_OPTIONS if length != "Custom"]
+    combinations = itertools.product(tags, lengths, languages or LANGUAGE_OPTIONS, tones or TONE_OPTIONS)
+    return [
+        {"type": "generate", "tag": tag, "length": length, "language": language, "tone": tone}
+        for tag, length, language, tone in combinations
+    ]
+
+
+def read_jsonl(path):
+    """Jobs in a JSONL file; a line that is not valid JSON becomes a job that job_problem() rejects."""
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                jobs.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                jobs.append({"line": number, "raw": line.rstrip("\n"), "parse_error": str(e)})
+    return jobs
+
+
+def completed_job_ids(output_path):
+    """Ids of jobs that already succeeded in a previous (possibly interrupted) run."""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def job_problem(job):
+    """Why a job cannot run (not an object, unknown type, missing fields), or None."""
+    if not isinstance(job, dict):
+        return "job is not a JSON object"
+    if "parse_error" in job:
+        return f"line {job['line']} is not valid JSON ({job['parse_error']})"
+    kind = job.get("type", "generate")
+    if kind not in REQUIRED_FIELDS:
+        return f"unknown job type {kind!r}"
+    missing = [field for field in REQUIRED_FIELDS[kind] if not job.get(field)]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    return None
+
+
+def job_record(job, output, start, posts=(), ok=True):
+    return {
+        "id": job_id(job),
+        "status": "ok" if ok and not output.startswith(ERROR_PREFIXES) else "error",
+        "latency_s": round(time.perf_counter() - start, 3),
+        "job": job,
+        "output": output,
+        "posts": list(posts),
+    }
+
+
+def run_job(job, use_cache=True):
+    """Run one generate or rewrite job and return its result record; a job that fails gets an error record."""
+    start = time.perf_counter()
+    problem = job_problem(job)
+    if problem:
+        return job_record(job, f"Error: {problem}", start)
+    try:
+        if job.get("type", "generate") == "rewrite":
+            output = rewrite_post(job["text"], job["length"], job["language"], job["tone"],
+                                  job.get("custom_line_count"), use_cache=use_cache)
+            return job_record(job, output, start)
+        output = generate_post(job["length"], job["language"], job["tag"], job["tone"],
+                               job.get("custom_line_count"), use_cache=use_cache)
+        posts = [{"post": post, "image": image, "hashtags": hashtags}
+                 for post, image, hashtags in parse_posts(output)[0]]
+        # An answer with no parseable post is a failure, so --resume retries it
+        return job_record(job, output, start, posts, ok=bool(posts))
+    except Exception as e:
+        print(f"Job {job_id(job)} failed: {e}")
+        return job_record(job, f"Error: {e}", start)
+
+
+def run_batch(jobs_path, output_path="data/batch_results.jsonl", concurrency=4, use_cache=True, resume=True):
+    """Run every job in a JSONL file with bounded concurrency.
+
+    Results are appended to output_path as each job finishes. With resume=True,
+    jobs that already succeeded there are skipped; failed ones are retried.
+    Jobs on a malformed line, with a missing field or an unknown type, that
+    raise or that yield no parseable post get a status "error" record; the
+    rest of the batch still runs.
+    Returns a summary with throughput and latency percentiles.
+    """
+    jobs = read_jsonl(jobs_path)
+    done = completed_job_ids(output_path) if resume else set()
+    pending = [job for job in jobs if job_id(job) not in done]
+    invalid = [job for job in pending if job_problem(job)]
+    pending = [job for job in pending if not job_problem(job)]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending) - len(invalid)} already done, "
+          f"{len(invalid)} invalid, {len(pending)} to run")
+
+    latencies, failed = [], len(invalid)
+    start = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        # Invalid jobs get an error record up front instead of stopping the run
+        for job in invalid:
+            record = run_job(job)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            print(f"Skipping job {record['id']}: {record['output']}")
+        out.flush()
+        futures = [executor.submit(run_job, job, use_cache) for job in pending]
+        for i, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(result["latency_s"])
+            failed += result["status"] != "ok"
+            print(f"[{i}/{len(pending)}] {result['id']} {result['status']} in {result['latency_s']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    summary = {
+        "jobs_run": len(pending),
+        "invalid": len(invalid),
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "jobs_per_s": round(len(pending) / elapsed, 2) if elapsed else 0,
+        "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p95_s": latencies[int(len(latencies) * 0.95)] if latencies else None,
+    }
+    print(json.dumps(summary))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless bulk generation over post_generator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    make = commands.add_parser("make-jobs", help="Write a job file covering every tag/length/language/tone")
+    make.add_argument("--out", default="data/jobs.jsonl")
+
+    run = commands.add_parser("run", help="Run a JSONL job file")
+    run.add_argument("jobs", nargs="?", default="data/jobs.jsonl")
+    run.add_argument("--out", default="data/batch_results.jsonl")
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--no-cache", action="store_true", help="Always call the model")
+    run.add_argument("--restart", action="store_true", help="Ignore previous results instead of resuming")
+    args = parser.parse_args()
+
+    if args.command == "make-jobs":
+        jobs = make_jobs()
+        with open(args.out, "w", encoding="utf-8") as f:
+            for job in jobs:
+                f.write(json.dumps(job, ensure_ascii=False) + "\n")
+        print(f"Wrote {len(jobs)} jobs to {args.out}")
+    else:
+        run_batch(args.jobs, args.out, concurrency=args.concurrency,
+                  use_cache=not args.no_cache, resume=not args.restart)
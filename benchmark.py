@@ -0,0 +1,744 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import dedup
+import embeddings
+import llm_helper
+import post_generator
+import preprocess
+from fake_llm import FakeLLM
+from llm_gateway import LLMGateway
+from corpus_store import columnar_path_for, write_columnar
+from favorites_store import FavoritesStore
+from few_shot import FewShotPosts, get_few_shot_posts
+from post_parser import parse_posts
+from prewarm import Prewarmer
+
+
+def make_synthetic_posts(n, seed=42, source="data/processed_posts.json"):
+    """Build n posts by resampling the processed corpus."""
+    with open(source, encoding="utf-8") as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    return [dict(rng.choice(base), line_count=rng.randint(1, 30)) for _ in range(n)]
+
+
+def make_synthetic_raw_posts(n, seed=42, source="data/raw_posts.json"):
+    """Build n distinct raw posts from data/raw_posts.json.
+
+    Each is a resampled post with its lines shuffled and half of its words swapped
+    for words drawn from the post's own text, so line structure and script stay
+    realistic but posts are not near-duplicates of each other.
+    """
+    with open(source, encoding="utf-8") as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    posts = []
+    for i in range(n):
+        lines = rng.choice(base)["text"].split("\n")
+        rng.shuffle(lines)
+        vocabulary = " ".join(lines).split() or ["post"]
+        lines = [" ".join(rng.choice(vocabulary) if rng.random() < 0.5 else word for word in line.split(" "))
+                 for line in lines]
+        posts.append({"text": "\n".join(lines) + f"\n#{i}"})
+    return posts
+
+
+@contextlib.contextmanager
+def fake_llm(args, responder):
+    """Swap the app's model for a seeded FakeLLM behind the real gateway (retries, breaker), then restore it."""
+    fake = FakeLLM(responder, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                   error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    gateway = LLMGateway([("fake", fake)], max_concurrency=max(args.concurrency, 1), retries=3,
+                         base_delay=0.01, max_delay=0.1, breaker_threshold=10_000)
+    original = llm_helper.llm
+    llm_helper.llm = gateway
+    llm_helper.response_cache.clear()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield fake
+    finally:
+        llm_helper.llm = original
+
+
+def load_synthetic(n):
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(make_synthetic_posts(n), f)
+        path = f.name
+    try:
+        return FewShotPosts(path)
+    finally:
+        os.remove(path)
+
+
+def time_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def pandas_filter(fs, length, language, tag):
+    """The original DataFrame scan that get_filtered_posts used before the index."""
+    df = fs.df
+    df_filtered = df[
+        (df['language'] == language) &
+        (df['length'] == length) &
+        (df['tags'].apply(lambda tags: isinstance(tags, list) and tag in tags))
+    ]
+    return df_filtered.to_dict(orient="records")
+
+
+def bench_few_shot(sizes, repeat):
+    results = []
+    for n in sizes:
+        start = time.perf_counter()
+        fs = load_synthetic(n)
+        load_s = time.perf_counter() - start
+        query = ("Medium", "English", "Job Search")
+        index_s = time_call(lambda: fs.get_filtered_posts(*query), repeat)
+        fs.df  # built on first access; keep that out of the scan timing
+        pandas_s = time_call(lambda: pandas_filter(fs, *query), max(1, repeat // 10))
+        results.append({
+            "posts": n,
+            "matches": len(fs.get_filtered_posts(*query)),
+            "load_ms": round(load_s * 1000, 1),
+            "index_ms": round(index_s * 1000, 4),
+            "pandas_ms": round(pandas_s * 1000, 4),
+            "speedup": round(pandas_s / index_s, 1) if index_s else None,
+        })
+    return results
+
+
+def bench_rerun(repeat, file_path="data/processed_posts.json"):
+    """Corpus cost paid by a Streamlit rerun: a fresh FewShotPosts vs the shared one."""
+    get_few_shot_posts(file_path)
+    fresh_s = time_call(lambda: FewShotPosts(file_path), repeat)
+    shared_s = time_call(lambda: get_few_shot_posts(file_path), repeat)
+    return [{
+        "corpus": file_path,
+        "fresh_ms": round(fresh_s * 1000, 4),
+        "shared_ms": round(shared_s * 1000, 4),
+    }]
+
+
+def fake_preprocess_responder(prompt):
+    """Answer the packed tagging and tag-unification prompts with well-formed JSON."""
+    if "list of tags" in prompt:
+        return "{}"
+    posts = json.loads(prompt.rsplit("Posts:", 1)[-1])
+    return json.dumps([{"id": post["id"], "tags": [post["post"].split()[0]]} for post in posts])
+
+
+def bench_preprocess(n_posts, concurrencies, latency=0.05, error_rate=0.05, rate_limit_rate=0.05):
+    """Ingestion throughput against a fake LLM that injects latency, 503s and 429s."""
+    # Distinct posts: resampled copies would mostly be dropped as near-duplicates before tagging
+    raw = make_synthetic_raw_posts(n_posts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "raw.json")
+        with open(raw_path, "w", encoding="utf-8") as f:
+            json.dump(raw, f)
+
+        results, outputs = [], {}
+        original_llm = llm_helper.llm
+        try:
+            for concurrency in concurrencies:
+                fake = FakeLLM(fake_preprocess_responder, latency=latency,
+                               error_rate=error_rate, rate_limit_rate=rate_limit_rate)
+                llm_helper.llm = LLMGateway([("fake", fake)], max_concurrency=max(concurrency, 1),
+                                            base_delay=0.01, max_delay=0.1, breaker_threshold=10_000)
+                out_path = os.path.join(tmp, f"processed_{concurrency}.json")
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    preprocess.process_posts(raw_path, out_path, concurrency=concurrency, retries=8)
+                elapsed = time.perf_counter() - start
+                with open(out_path, encoding="utf-8") as f:
+                    outputs[concurrency] = json.load(f)
+                results.append({
+                    "posts": n_posts,
+                    "tagged": len(outputs[concurrency]),
+                    "concurrency": concurrency,
+                    "llm_calls": fake.calls,
+                    "seconds": round(elapsed, 3),
+                    "posts_per_s": round(n_posts / elapsed, 1),
+                    "same_order_as_sequential": outputs[concurrency] == outputs[concurrencies[0]],
+                })
+        finally:
+            llm_helper.llm = original_llm
+    return results
+
+
+LEGACY_POST_PATTERN = re.compile(r"Post\s*\d+:\s*(.*?)\s*Image Idea\s*\d+:\s*(.*?)\s*(#[^\n]+(?:\s*#[^\n]+)*)", re.DOTALL)
+
+
+def legacy_extract_posts(raw_output):
+    """The single-regex extract_posts that main.py used before the stream parser."""
+    return [tuple(part.strip() for part in match) for match in LEGACY_POST_PATTERN.findall(raw_output)[:3]]
+
+
+def parser_inputs():
+    long_post = "\n".join(f"Line {i}: reflections on growth and advice." for i in range(120))
+    well_formed = "\n\n".join(
+        f"Post {n}:\n{long_post}\nImage Idea {n}:\nA sunrise over a desk\n#Growth #Career" for n in (1, 2, 3)
+    )
+    return {
+        "well_formed_long": well_formed,
+        "no_hashtags": "\n".join(f"Post {n}: text\nImage Idea {n}: picture" for n in range(100)),
+        "no_image_ideas": "\n".join(f"Post {n}:\n{long_post}" for n in range(50)),
+    }
+
+
+def bench_parser(repeat):
+    results = []
+    for name, text in parser_inputs().items():
+        parser_s = time_call(lambda: parse_posts(text), repeat)
+        regex_s = time_call(lambda: legacy_extract_posts(text), max(1, repeat // 10))
+        results.append({
+            "input": name,
+            "chars": len(text),
+            "parser_posts": len(parse_posts(text)[0]),
+            "regex_posts": len(legacy_extract_posts(text)),
+            "parser_ms": round(parser_s * 1000, 3),
+            "regex_ms": round(regex_s * 1000, 3),
+        })
+    return results
+
+
+def fake_generation_responder(prompt):
+    """Answer generation prompts with as many well-formed posts as were asked for."""
+    count = 1 if "Generate 1 LinkedIn post" in prompt else 3
+    body = " ".join(["Consistency beats intensity when you are building a career."] * 10)
+    return "\n\n".join(f"Post {n}:\n{body}\nImage Idea {n}:\nA desk at sunrise\n#Career #Growth"
+                        for n in range(1, count + 1))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def bench_fanout(trials, latency=0.3, tokens_per_second=300, error_rate=0.1):
+    """Single three-post prompt vs three concurrent single-post prompts."""
+    query = ("Medium", "English", "Job Search", "Professional")
+
+    def single():
+        return parse_posts(post_generator.generate_post(*query, use_cache=False))[0]
+
+    def fanout():
+        return [post for _, raw in post_generator.generate_posts_fanout(*query, use_cache=False)
+                for post in parse_posts(raw, max_posts=1)[0]]
+
+    results = []
+    original_llm = llm_helper.llm
+    try:
+        for name, run in (("single_prompt", single), ("fan_out", fanout)):
+            llm_helper.llm = FakeLLM(fake_generation_responder, latency=latency,
+                                     tokens_per_second=tokens_per_second, error_rate=error_rate, seed=1)
+            durations, posts = [], 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(trials):
+                    start = time.perf_counter()
+                    posts += len(run())
+                    durations.append(time.perf_counter() - start)
+            results.append({
+                "mode": name,
+                "trials": trials,
+                "p50_s": round(percentile(durations, 0.5), 3),
+                "p95_s": round(percentile(durations, 0.95), 3),
+                "post_failure_rate": round(1 - posts / (3 * trials), 3),
+            })
+    finally:
+        llm_helper.llm = original_llm
+    return results
+
+
+def fake_rewrite_responder(prompt):
+    if "Rewrite the following" in prompt:
+        return " ".join(["A sharper, clearer version of the original post."] * 12)
+    return fake_generation_responder(prompt)
+
+
+def bench_generation(args):
+    """End-to-end generate_post and rewrite_post latency and throughput against the fake LLM (cache off)."""
+    tags = get_few_shot_posts().get_tags_by_popularity() or ["Job Search"]
+    original = make_synthetic_raw_posts(1, seed=args.seed)[0]["text"]
+    operations = {
+        "generate_post": lambda i: post_generator.generate_post(
+            "Medium", "English", tags[i % len(tags)], post_generator.TONE_OPTIONS[i % 4], use_cache=False),
+        "rewrite_post": lambda i: post_generator.rewrite_post(
+            f"{original}\n{i}", "Short", "English", "Professional", use_cache=False),
+    }
+    results = []
+    for name, operation in operations.items():
+        with fake_llm(args, fake_rewrite_responder) as fake:
+            def timed(i):
+                start = time.perf_counter()
+                output = operation(i)
+                return time.perf_counter() - start, output.startswith("Error")
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as executor:
+                runs = list(executor.map(timed, range(args.requests)))
+            elapsed = time.perf_counter() - start
+        durations = [duration for duration, _ in runs]
+        results.append({
+            "operation": name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_calls": fake.calls,
+            "p50_ms": round(percentile(durations, 0.5) * 1000, 1),
+            "p95_ms": round(percentile(durations, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(durations, 0.99) * 1000, 1),
+            "requests_per_s": round(args.requests / elapsed, 2),
+            "error_rate": round(sum(failed for _, failed in runs) / args.requests, 3),
+        })
+    return results
+
+
+def bench_prewarm(args, budgets=(10, 1000), think_time=0.1):
+    """Sequential requests over a skewed mix of selections, with and without a pool prewarmed between them.
+
+    Selection i of the mix is requested with weight 1 / (i + 1), and each request
+    is followed by think_time of idle time in which the prewarmer may refill.
+    """
+    tags = get_few_shot_posts().get_tags_by_popularity()[:5] or ["Job Search"]
+    combos = [(length, "English", tag, tone) for tag in tags for length in ("Short", "Medium")
+              for tone in post_generator.TONE_OPTIONS[:2]]
+    rng = random.Random(args.seed)
+    workload = rng.choices(combos, weights=[1 / (i + 1) for i in range(len(combos))], k=args.requests)
+    results = []
+    for budget in (0,) + tuple(budgets):
+        with fake_llm(args, fake_generation_responder) as fake:
+            prewarmer = Prewarmer(calls_per_hour=budget, idle_seconds=think_time / 4).start()
+            hits, misses = [], []
+            for combo in workload:
+                start = time.perf_counter()
+                pooled = prewarmer.take(*combo)
+                if pooled is None:
+                    post_generator.generate_post(*combo, use_cache=False)
+                (hits if pooled is not None else misses).append(time.perf_counter() - start)
+                time.sleep(think_time)
+            prewarmer.stop()
+            status = prewarmer.status()
+        results.append({
+            "calls_per_hour": budget,
+            "requests": args.requests,
+            "hit_rate": status["hit_rate"] or 0.0,
+            "hit_p50_ms": round(percentile(hits, 0.5) * 1000, 3) if hits else None,
+            "miss_p50_ms": round(percentile(misses, 0.5) * 1000, 1) if misses else None,
+            "prewarm_llm_calls": status["llm_calls"],
+            "unused_pooled": sum(status["pools"].values()),
+            "llm_calls": fake.calls,
+        })
+    return results
+
+
+def bench_ingest(args):
+    """End-to-end process_posts on synthetic raw corpora of several sizes."""
+    results = []
+    for n in args.ingest_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = os.path.join(tmp, "raw.json")
+            with open(raw_path, "w", encoding="utf-8") as f:
+                json.dump(make_synthetic_raw_posts(n, seed=args.seed), f)
+            with fake_llm(args, fake_preprocess_responder) as fake:
+                start = time.perf_counter()
+                preprocess.process_posts(raw_path, os.path.join(tmp, "processed.json"),
+                                         concurrency=args.concurrency, retries=8,
+                                         checkpoint_path=os.path.join(tmp, "checkpoint.jsonl"),
+                                         tag_mapping_path=os.path.join(tmp, "tag_mapping.json"))
+                elapsed = time.perf_counter() - start
+        results.append({
+            "posts": n,
+            "concurrency": args.concurrency,
+            "llm_calls": fake.calls,
+            "seconds": round(elapsed, 3),
+            "posts_per_s": round(n / elapsed, 1),
+        })
+    return results
+
+
+def bench_coalesce(burst=32, latency=0.3):
+    """A burst of identical Generate clicks: upstream calls with and without single-flight."""
+    query = ("Medium", "English", "Job Search", "Professional")
+    results = []
+    original_llm = llm_helper.llm
+    try:
+        for name, streaming in (("complete", False), ("stream", True)):
+            fake = llm_helper.llm = FakeLLM(fake_generation_responder, latency=latency, tokens_per_second=2000)
+            llm_helper.response_cache.clear()
+            before = llm_helper.inflight.stats()["coalesced"]
+
+            def click(_):
+                if streaming:
+                    return "".join(post_generator.generate_post_stream(*query))
+                return post_generator.generate_post(*query)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(burst) as executor:
+                outputs = list(executor.map(click, range(burst)))
+            results.append({
+                "mode": name,
+                "requests": burst,
+                "upstream_calls": fake.calls,
+                "coalesced": llm_helper.inflight.stats()["coalesced"] - before,
+                "wall_s": round(time.perf_counter() - start, 3),
+                "identical_outputs": len(set(outputs)) == 1,
+            })
+    finally:
+        llm_helper.llm = original_llm
+    return results
+
+
+def bench_favorites(sizes, repeat, page_size=10):
+    """Sidebar filter over n favorites: the old in-memory substring scan vs one SQLite page."""
+    tones = post_generator.TONE_OPTIONS
+    languages = post_generator.LANGUAGE_OPTIONS
+    results = []
+    for n in sizes:
+        posts = make_synthetic_posts(n)
+        favorites = [{"post": p["text"], "image": "", "hashtags": "", "tone": tones[i % len(tones)],
+                      "topic": p["tags"][0] if p["tags"] else None, "language": p["language"]}
+                     for i, p in enumerate(posts)]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FavoritesStore(os.path.join(tmp, "favorites.sqlite3"))
+            with store._lock:
+                store._conn.executemany(
+                    "INSERT INTO favorites (post, image, hashtags, tone, topic, language, created_at) "
+                    "VALUES (:post, :image, :hashtags, :tone, :topic, :language, 0)", favorites)
+                store._conn.commit()
+
+            def scan(search="career", tone="Professional", language="English"):
+                return [f for f in favorites if search in f["post"].lower() and tone.lower() in f["post"].lower()
+                        and language.lower() in f["post"].lower()]
+
+            scan_s = time_call(scan, repeat)
+            query_s = time_call(lambda: store.query("career", tone="Professional", language="English",
+                                                    limit=page_size), repeat)
+            results.append({"favorites": n, "scan_ms": round(scan_s * 1000, 2),
+                            "sqlite_page_ms": round(query_s * 1000, 2)})
+    return results
+
+
+def mutate(text, rng, rate):
+    """Replace a share of the words in text with random filler, like a light edit of a repost."""
+    words = text.split(" ")
+    for _ in range(max(1, int(len(words) * rate))):
+        words[rng.randrange(len(words))] = rng.choice(["really", "today", "team", "new", "so", "great"])
+    return " ".join(words)
+
+
+def exact_jaccard(a, b):
+    sa, sb = set(dedup.shingle_hashes(a).tolist()), set(dedup.shingle_hashes(b).tolist())
+    return len(sa & sb) / len(sa | sb)
+
+
+def bench_dedup(sizes, queries=500, seed=7):
+    """MinHash/LSH near-duplicate detection: accuracy against exact Jaccard, build and query speed."""
+    rng = random.Random(seed)
+    results = []
+    for n in sizes:
+        # Random word sequences over the raw corpus vocabulary: distinct by construction, so every
+        # near-duplicate in the set is one planted below
+        with open("data/raw_posts.json", encoding="utf-8") as f:
+            vocabulary = sorted({word for post in json.load(f) for word in post["text"].split()})
+        base = [" ".join(rng.choices(vocabulary, k=rng.randint(20, 150))) for _ in range(n)]
+        # A fifth of the corpus are edited reposts of earlier posts, at several edit rates
+        texts, source = list(base), [-1] * n
+        for i in range(n // 5, n, 5):
+            j = rng.randrange(i)
+            texts[i] = mutate(base[j], rng, rng.choice([0.0, 0.02, 0.05, 0.15, 0.4]))
+            source[i] = j
+
+        start = time.perf_counter()
+        signatures = dedup.minhash_signatures(texts)
+        signature_s = time.perf_counter() - start
+        start = time.perf_counter()
+        duplicate_of = dedup.find_duplicates(signatures)
+        dedupe_s = time.perf_counter() - start
+
+        # Precision/recall over the planted pairs, judged by exact shingle Jaccard
+        planted = [i for i in range(n) if source[i] >= 0]
+        sample = rng.sample(planted, min(2000, len(planted)))
+        truth = {i: exact_jaccard(texts[i], texts[source[i]]) >= dedup.DUPLICATE_THRESHOLD for i in sample}
+        flagged = {i: duplicate_of[i] >= 0 for i in sample}
+        true_pos = sum(truth[i] and flagged[i] for i in sample)
+        recall = true_pos / max(1, sum(truth.values()))
+        # Flags on pairs below the threshold are false positives (chance resemblance of unrelated posts counts too)
+        precision = true_pos / max(1, sum(flagged.values()))
+
+        index = dedup.DedupIndex.from_signatures(signatures)
+        probes = [mutate(texts[rng.randrange(n)], rng, 0.02) for _ in range(queries)]
+        durations, hits = [], 0
+        for probe in probes:
+            start = time.perf_counter()
+            hits += bool(index.query(probe))
+            durations.append(time.perf_counter() - start)
+        results.append({
+            "posts": n,
+            "signatures_per_s": round(n / signature_s),
+            "dedupe_s": round(dedupe_s, 3),
+            "duplicates_removed": int((duplicate_of >= 0).sum()),
+            "precision": round(precision, 3),
+            "recall": round(recall, 3),
+            "query_p50_ms": round(percentile(durations, 0.5) * 1000, 3),
+            "query_p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+            "query_hit_rate": round(hits / queries, 3),
+            "index_mb": round((index.signatures.nbytes + index.sorted_keys.nbytes + index.sorted_rows.nbytes) / 2 ** 20, 1),
+        })
+    return results
+
+
+def bench_semantic(sizes, queries=200, k=3):
+    """IVF search latency and recall@k against exact brute-force cosine within the group."""
+    with open("data/processed_posts.json", encoding="utf-8") as f:
+        base = json.load(f)
+    base_vectors = embeddings.embed_texts([post["text"] for post in base])
+    groups = [("English", "Short"), ("English", "Medium"), ("English", "Long"), ("Tamil", "Short"), ("Sinhala", "Short")]
+    rng = np.random.default_rng(0)
+
+    results = []
+    for n in sizes:
+        picks = rng.integers(len(base), size=n)
+        vectors = base_vectors[picks] + rng.normal(scale=0.05, size=(n, base_vectors.shape[1])).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        group_keys = [groups[i] for i in rng.integers(len(groups), size=n)]
+
+        start = time.perf_counter()
+        lists = max(1, min(embeddings.MAX_LISTS, n // embeddings.ROWS_PER_LIST))
+        centroids = embeddings.train_centroids(vectors, lists) if lists > 1 else np.zeros((1, vectors.shape[1]), np.float32)
+        assign = embeddings.assign_lists(vectors, centroids) if lists > 1 else np.zeros(n, np.int32)
+        index = embeddings.EmbeddingIndex.from_vectors(vectors, group_keys, centroids, assign, digest="")
+        build_s = time.perf_counter() - start
+
+        group_rows = {group: np.array([i for i, key in enumerate(group_keys) if key == group]) for group in groups}
+        durations, hits = [], 0
+        for q in range(queries):
+            text = base[q % len(base)]["text"]
+            group = groups[q % len(groups)]
+            start = time.perf_counter()
+            found = index.search(text, group, k=k)
+            durations.append(time.perf_counter() - start)
+
+            rows = group_rows[group]
+            exact = rows[np.argsort(-(vectors[rows] @ embeddings.embed_texts([text])[0]))[:k]]
+            hits += len(set(found) & set(exact.tolist()))
+        results.append({
+            "posts": n,
+            "lists": lists,
+            "build_s": round(build_s, 2),
+            "p50_ms": round(percentile(durations, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+            f"recall_at_{k}": round(hits / (k * queries), 3),
+        })
+    return results
+
+
+# Peak RSS comes from VmHWM: ru_maxrss survives exec and would include the parent's footprint
+LOAD_PROBE = """
+import sys, time
+start = time.perf_counter()
+from few_shot import FewShotPosts
+fs = FewShotPosts(sys.argv[1])
+fs.get_filtered_posts("Medium", "English", "Job Search")
+with open("/proc/self/status") as f:
+    peak_kb = next(line.split()[1] for line in f if line.startswith("VmHWM"))
+print(time.perf_counter() - start, peak_kb)
+"""
+
+
+def probe_load(path):
+    """Load a corpus in a fresh interpreter; returns (seconds incl. imports, peak RSS in MB)."""
+    out = subprocess.run([sys.executable, "-c", LOAD_PROBE, path], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, rss_kb = out.stdout.split()[-2:]
+    return float(seconds), int(rss_kb) / 1024
+
+
+def bench_corpus_load(sizes):
+    """JSON vs memory-mapped Arrow corpus: load time and peak RSS."""
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            posts = make_synthetic_posts(n)
+            json_path = os.path.join(tmp, "posts.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(posts, f, indent=4)
+            json_s, json_rss = probe_load(json_path)
+
+            write_columnar(posts, columnar_path_for(json_path), FewShotPosts.categorize_length)
+            arrow_s, arrow_rss = probe_load(json_path)
+            results.append({
+                "posts": n,
+                "json_load_s": round(json_s, 2),
+                "json_rss_mb": round(json_rss),
+                "arrow_load_s": round(arrow_s, 2),
+                "arrow_rss_mb": round(arrow_rss),
+            })
+    return results
+
+
+# What each entry point does on a cold start, run in a fresh interpreter
+STARTUP_PROBES = {
+    "app": "import main; main.main()",
+    "api": "import api",
+    "post_generator": "import post_generator",
+    "few_shot_query": "from few_shot import FewShotPosts; FewShotPosts().get_filtered_posts('Medium', 'English', 'Job Search')",
+    "preprocess_cli": "import preprocess",
+}
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def probe_startup(code):
+    """Run code under -X importtime in a fresh interpreter.
+
+    Returns (seconds, {third-party package: seconds spent importing its modules}).
+    """
+    probe = f"import time\nstart = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True,
+                         check=True, cwd=here, env=os.environ | {"GROQ_API_KEY": "benchmark"})
+    local = {os.path.splitext(name)[0] for name in os.listdir(here) if name.endswith(".py")}
+    packages = {}
+    for match in IMPORT_TIME_LINE.finditer(out.stderr):
+        package = match.group(4).split(".")[0]
+        if package not in local and package not in sys.stdlib_module_names:
+            packages[package] = packages.get(package, 0) + int(match.group(1)) / 1e6
+    return float(out.stdout.split()[-1]), packages
+
+
+def bench_startup(repeat):
+    """Cold-start time per entry point (median of fresh interpreters) and the heaviest third-party imports."""
+    results = []
+    for name, code in STARTUP_PROBES.items():
+        runs = [probe_startup(code) for _ in range(repeat)]
+        seconds = sorted(run[0] for run in runs)
+        _, packages = runs[len(runs) // 2]
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:3]
+        results.append({
+            "entry_point": name,
+            "cold_start_ms": round(seconds[len(seconds) // 2] * 1000, 1),
+            "heaviest_imports_ms": {package: round(s * 1000, 1) for package, s in heaviest},
+            "pandas_imported": "pandas" in packages,
+        })
+    return results
+
+
+def bench_load_scaling(base=20_000, factor=10, max_ratio=20):
+    """Regression guard: loading factor x more posts must cost roughly factor x more time.
+
+    A linear loader gives a ratio near `factor`; the old quadratic tag vocabulary
+    gave roughly factor ** 2. The row is marked failed above max_ratio.
+    """
+    timings = {}
+    for n in (base, base * factor):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "posts.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(make_synthetic_posts(n), f)
+            timings[n] = min(time_call(lambda: FewShotPosts(path), 1) for _ in range(3))
+    ratio = timings[base * factor] / timings[base]
+    return [{
+        "small_posts": base,
+        "large_posts": base * factor,
+        "small_s": round(timings[base], 3),
+        "large_s": round(timings[base * factor], 3),
+        "ratio": round(ratio, 1),
+        "passed": ratio <= max_ratio,
+    }]
+
+
+SUITES = {
+    "generation": bench_generation,
+    "ingest": bench_ingest,
+    "prewarm": bench_prewarm,
+    "few_shot": lambda args: bench_few_shot(args.sizes, args.repeat),
+    "rerun": lambda args: bench_rerun(args.repeat),
+    "preprocess": lambda args: bench_preprocess(200, [1, 8, 32]),
+    "parser": lambda args: bench_parser(args.repeat),
+    "fanout": lambda args: bench_fanout(args.repeat),
+    "coalesce": lambda args: bench_coalesce(),
+    "favorites": lambda args: bench_favorites([n for n in args.sizes if n <= 100_000] or args.sizes, args.repeat),
+    "dedup": lambda args: bench_dedup(args.sizes),
+    "semantic": lambda args: bench_semantic(args.sizes),
+    "load_scaling": lambda args: bench_load_scaling(),
+    "startup": lambda args: bench_startup(min(args.repeat, 5)),
+    "corpus_load": lambda args: bench_corpus_load([n for n in args.sizes if n >= 100_000] or args.sizes),
+}
+
+
+def compare(results, baseline_path):
+    """Print how each numeric field moved against a saved --output run (rows matched by suite and position)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    by_suite = {}
+    for row in baseline:
+        by_suite.setdefault(row["suite"], []).append(row)
+    seen = {}
+    for row in results:
+        position = seen[row["suite"]] = seen.get(row["suite"], -1) + 1
+        old_rows = by_suite.get(row["suite"], [])
+        if position >= len(old_rows):
+            continue
+        old = old_rows[position]
+        changes = {
+            key: f"{old[key]} -> {value} ({(value - old[key]) / old[key]:+.1%})"
+            for key, value in row.items()
+            if isinstance(value, float) and isinstance(old.get(key), (int, float)) and old[key]
+        }
+        if changes:
+            print(json.dumps({"suite": row["suite"], "row": position, "changes": changes}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks.")
+    parser.add_argument("suites", nargs="*", help=f"Suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ingest-sizes", type=int, nargs="+", default=[100, 1_000])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per operation in the generation suite")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500, help="Fake LLM token rate (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fake LLM share of 503 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02, help="Fake LLM share of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write all results, with run metadata, to this JSON file")
+    parser.add_argument("--compare", help="A previous --output file to compare this run against")
+    args = parser.parse_args()
+
+    unknown = set(args.suites) - SUITES.keys()
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    failed = False
+    results = []
+    for suite in args.suites or SUITES:
+        for row in SUITES[suite](args):
+            results.append({"suite": suite} | row)
+            print(json.dumps(results[-1]))
+            failed |= row.get("passed") is False
+
+    if args.output:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+        meta = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit or None,
+                "python": platform.python_version(), "machine": platform.machine(), "args": vars(args)}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    sys.exit(1 if failed else 0)
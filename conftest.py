@@ -0,0 +1,20 @@
+import pytest
+
+import llm_helper
+from fake_llm import FakeLLM, default_responder
+from llm_gateway import LLMGateway
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Install a FakeLLM behind a gateway (no retries) as the app's model, with an empty response cache.
+
+    Call it with an optional responder and FakeLLM options; it returns the FakeLLM.
+    """
+    def install(responder=default_responder, **options):
+        fake = FakeLLM(responder, **options)
+        monkeypatch.setattr(llm_helper, "llm", LLMGateway([("fake", fake)], retries=0))
+        llm_helper.response_cache.clear()
+        return fake
+
+    return install
@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+
+# pyarrow takes ~50ms to import, so it loads only when a corpus is written or mapped
+
+
+def columnar_path_for(file_path):
+    """data/processed_posts.json -> data/processed_posts.arrow"""
+    return os.path.splitext(file_path)[0] + ".arrow"
+
+
+def dictionary_list_array(lists):
+    """list<string> with the nested values dictionary-encoded."""
+    import pyarrow as pa
+
+    plain = pa.array([tags if isinstance(tags, list) else [] for tags in lists], type=pa.list_(pa.string()))
+    return pa.ListArray.from_arrays(plain.offsets, plain.flatten().dictionary_encode())
+
+
+def write_columnar(posts, path, categorize_length):
+    """Write posts as an uncompressed Arrow IPC file so readers can memory-map it.
+
+    language, length and tags are dictionary-encoded; text is its own column and
+    is only touched when a post is materialized.
+    """
+    import pyarrow as pa
+
+    line_counts = [post.get("line_count") for post in posts]
+    table = pa.table({
+        "text": pa.array([post.get("text", "") for post in posts], type=pa.large_string()),
+        "line_count": pa.array(line_counts, type=pa.int32()),
+        "language": pa.array([post.get("language") for post in posts], type=pa.string()).dictionary_encode(),
+        "length": pa.array([categorize_length(count) for count in line_counts], type=pa.string()).dictionary_encode(),
+        "tags": dictionary_list_array([post.get("tags") for post in posts]),
+    })
+
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+class ColumnarCorpus:
+    """Memory-mapped view of a corpus written by write_columnar."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        with pa.memory_map(path, "r") as source:
+            self.table = pa.ipc.open_file(source).read_all()
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def column(self, name):
+        """A column as one array; a single chunk is returned as-is so it stays a zero-copy view."""
+        column = self.table.column(name)
+        return column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+
+class LazyPosts:
+    """Sequence of post dicts that are only built (text included) when indexed."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self._text = corpus.column("text")
+        self._line_count = corpus.column("line_count")
+        self._language = corpus.column("language")
+        self._length = corpus.column("length")
+        self._tags = corpus.column("tags")
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return {
+            "text": self._text[i].as_py(),
+            "line_count": self._line_count[i].as_py(),
+            "language": self._language[i].as_py(),
+            "tags": self._tags[i].as_py(),
+            "length": self._length[i].as_py(),
+        }
+
+
+if __name__ == "__main__":
+    from few_shot import FewShotPosts
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "data/processed_posts.json"
+    with open(source, encoding="utf-8") as f:
+        posts = json.load(f)
+    target = columnar_path_for(source)
+    write_columnar(posts, target, FewShotPosts.categorize_length)
+    print(f"Wrote {len(posts)} posts to {target}")
@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+DUPLICATE_THRESHOLD = 0.8
+MAX_BUCKET_CANDIDATES = 1000
+WORD = re.compile(r"\w+")
+
+_rng = np.random.default_rng(20240607)
+PERM_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+SHINGLE_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+BAND_MIX = np.uint64(0x100000001B3)
+
+
+def shingle_hashes(text):
+    """64-bit hashes of the distinct 3-word shingles in a text (whole words for very short texts)."""
+    words = np.array([zlib.crc32(word.encode("utf-8")) for word in WORD.findall(text.casefold())], dtype=np.uint64)
+    if len(words) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    if len(words) < SHINGLE_WORDS:
+        return np.unique(words * SHINGLE_MIX[0])
+    n = len(words) - SHINGLE_WORDS + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in range(SHINGLE_WORDS):
+        hashes ^= words[j:j + n] * SHINGLE_MIX[j]
+    return np.unique(hashes)
+
+
+def minhash_signatures(texts, chunk_size=4096):
+    """(n, NUM_PERM) uint32 MinHash signatures, built chunk by chunk to bound memory."""
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(texts), chunk_size):
+        hashes = [shingle_hashes(text) for text in texts[start:start + chunk_size]]
+        offsets = np.zeros(len(hashes), dtype=np.int64)
+        np.cumsum([len(h) for h in hashes[:-1]], out=offsets[1:])
+        flat = np.concatenate(hashes)
+        if len(flat) * NUM_PERM <= 1 << 20:
+            # Small input (e.g. one query): all permutations in a single array operation
+            permuted = ((flat[None, :] * PERM_A[:, None] + PERM_B[:, None]) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:start + len(hashes)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            continue
+        for p in range(NUM_PERM):
+            permuted = ((flat * PERM_A[p] + PERM_B[p]) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:start + len(hashes), p] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def band_keys(signatures):
+    """(BANDS, n) uint64 bucket keys: each band's rows hashed together."""
+    bands = np.atleast_2d(signatures).reshape(-1, BANDS, ROWS_PER_BAND).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for r in range(ROWS_PER_BAND):
+        keys = keys * BAND_MIX ^ bands[:, :, r]
+    return np.ascontiguousarray(keys.T)
+
+
+def similarity(signature, signatures):
+    """Estimated Jaccard similarity between one signature and each row of signatures."""
+    return (np.atleast_2d(signatures) == signature).mean(axis=1)
+
+
+def find_duplicates(signatures, threshold=DUPLICATE_THRESHOLD, pair_chunk=100_000):
+    """For each row, the index of the earlier row it near-duplicates, or -1 if it is the first of its kind.
+
+    Rows that share an LSH bucket are paired with the bucket's earliest row and
+    kept as duplicates only if their estimated similarity reaches threshold.
+    """
+    n = len(signatures)
+    rows = np.arange(n, dtype=np.int64)
+    pairs = []
+    for keys in band_keys(signatures):
+        order = np.lexsort((rows, keys))
+        sorted_keys = keys[order]
+        starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        leaders = order[np.maximum.accumulate(np.where(starts, np.arange(n), 0))]
+        member = leaders != order
+        pairs.append(leaders[member] * n + order[member])
+    pairs = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+
+    parent = np.arange(n)
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for start in range(0, len(pairs), pair_chunk):
+        chunk = pairs[start:start + pair_chunk]
+        first, second = chunk // n, chunk % n
+        close = (signatures[first] == signatures[second]).mean(axis=1) >= threshold
+        for a, b in zip(first[close].tolist(), second[close].tolist()):
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+    duplicate_of = np.array([root(i) for i in range(n)], dtype=np.int64)
+    duplicate_of[duplicate_of == rows] = -1
+    return duplicate_of
+
+
+def dedupe_texts(texts, threshold=DUPLICATE_THRESHOLD):
+    """Indices of the texts to keep: the first of every group of near-duplicates."""
+    if not texts:
+        return []
+    return np.flatnonzero(find_duplicates(minhash_signatures(texts), threshold) < 0).tolist()
+
+
+class DedupIndex:
+    """LSH index over MinHash signatures for near-duplicate lookups.
+
+    Each band keeps its keys sorted next to the matching row ids, so a lookup is
+    BANDS binary searches plus a signature comparison on the few candidates.
+    All arrays can be memory-mapped from disk.
+    """
+
+    def __init__(self, signatures, sorted_keys, sorted_rows, digest=""):
+        self.signatures = signatures
+        self.sorted_keys = sorted_keys
+        self.sorted_rows = sorted_rows
+        self.digest = digest
+
+    @classmethod
+    def build(cls, texts, digest=""):
+        return cls.from_signatures(minhash_signatures(texts), digest)
+
+    @classmethod
+    def from_signatures(cls, signatures, digest=""):
+        keys = band_keys(signatures)
+        order = np.argsort(keys, axis=1, kind="stable").astype(np.int32)
+        return cls(signatures, np.take_along_axis(keys, order, axis=1), order, digest)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "signatures.npy"), self.signatures)
+        np.save(os.path.join(directory, "band_keys.npy"), self.sorted_keys)
+        np.save(os.path.join(directory, "band_rows.npy"), self.sorted_rows)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"digest": self.digest, "num_perm": NUM_PERM, "bands": BANDS}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a saved index; returns None if it is missing or was built with other parameters."""
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get("num_perm") != NUM_PERM or meta.get("bands") != BANDS:
+            return None
+        return cls(
+            np.load(os.path.join(directory, "signatures.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "band_keys.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "band_rows.npy"), mmap_mode="r"),
+            meta["digest"],
+        )
+
+    def candidates(self, signature):
+        found = []
+        for b, key in enumerate(band_keys(signature)[:, 0]):
+            lo = np.searchsorted(self.sorted_keys[b], key, side="left")
+            hi = np.searchsorted(self.sorted_keys[b], key, side="right")
+            found.append(self.sorted_rows[b][lo:min(hi, lo + MAX_BUCKET_CANDIDATES)])
+        return np.unique(np.concatenate(found))
+
+    def query(self, text, threshold=DUPLICATE_THRESHOLD):
+        """(row, similarity) pairs for indexed texts at or above threshold, most similar first."""
+        signature = minhash_signatures([text])[0]
+        rows = self.candidates(signature)
+        if len(rows) == 0:
+            return []
+        scores = similarity(signature, self.signatures[rows])
+        keep = scores >= threshold
+        return sorted(zip(rows[keep].tolist(), scores[keep].tolist()), key=lambda item: -item[1])
+
+
+class RecentSignatures:
+    """Ring buffer of the latest signatures, for checking new output against recent output."""
+
+    def __init__(self, capacity=1000):
+        self.signatures = np.zeros((capacity, NUM_PERM), dtype=np.uint32)
+        self.size = 0
+        self.next = 0
+        self._lock = threading.Lock()
+
+    def check_and_add(self, text):
+        """Highest similarity to anything seen before (0.0 if nothing), then remember the text."""
+        signature = minhash_signatures([text])[0]
+        with self._lock:
+            best = float(similarity(signature, self.signatures[:self.size]).max()) if self.size else 0.0
+            self.signatures[self.next] = signature
+            self.next = (self.next + 1) % len(self.signatures)
+            self.size = min(self.size + 1, len(self.signatures))
+        return best
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+EMBEDDING_DIM = 128
+ROWS_PER_LIST = 4000
+MAX_LISTS = 256
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Unicode words plus adjacent-word bigrams (works for Tamil and Sinhala script too)."""
+    words = WORD.findall(text.casefold())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed_texts(texts, dim=EMBEDDING_DIM):
+    """L2-normalized signed feature hashing of log-scaled token counts.
+
+    crc32 is used instead of hash() so vectors are stable across processes.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = {}
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            slot = (h % dim, 1.0 if h & 0x80000000 else -1.0)
+            counts[slot] = counts.get(slot, 0) + 1
+        for (column, sign), count in counts.items():
+            matrix[i, column] += sign * (1 + np.log(count))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def train_centroids(vectors, lists, iterations=8, sample_size=20000, seed=0):
+    """Spherical k-means on a sample of the vectors."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        nonempty = norms[:, 0] > 0
+        centroids[nonempty] = sums[nonempty] / norms[nonempty]
+    return centroids
+
+
+def assign_lists(vectors, centroids, chunk=50000):
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        assign[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return assign
+
+
+class EmbeddingIndex:
+    """Inverted-file cosine index over post embeddings.
+
+    Vectors are stored sorted by (group, list), where a group is a
+    (language, length) pair and a list is a k-means cell, so a query only scans
+    a few contiguous slices of the (memory-mapped) matrix.
+    """
+
+    def __init__(self, vectors, rows, centroids, groups, offsets, digest):
+        self.vectors = vectors
+        self.rows = rows
+        self.centroids = centroids
+        self.groups = {tuple(group): g for g, group in enumerate(groups)}
+        self.offsets = offsets
+        self.digest = digest
+
+    @classmethod
+    def build(cls, texts, group_keys, dim=EMBEDDING_DIM, digest=""):
+        vectors = embed_texts(texts, dim)
+        lists = max(1, min(MAX_LISTS, len(texts) // ROWS_PER_LIST))
+        if lists > 1:
+            centroids = train_centroids(vectors, lists)
+            assign = assign_lists(vectors, centroids)
+        else:
+            centroids = np.zeros((1, dim), dtype=np.float32)
+            assign = np.zeros(len(texts), dtype=np.int32)
+        return cls.from_vectors(vectors, group_keys, centroids, assign, digest)
+
+    @classmethod
+    def from_vectors(cls, vectors, group_keys, centroids, assign, digest):
+        groups = sorted(set(group_keys))
+        codes = {group: g for g, group in enumerate(groups)}
+        group_ids = np.array([codes[key] for key in group_keys], dtype=np.int32)
+
+        order = np.lexsort((assign, group_ids)).astype(np.int32)
+        cell = group_ids[order].astype(np.int64) * len(centroids) + assign[order]
+        bounds = np.searchsorted(cell, np.arange(len(groups) * len(centroids) + 1))
+        offsets = bounds.astype(np.int64)
+        return cls(vectors[order], order, centroids, groups, offsets, digest)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), np.ascontiguousarray(self.vectors))
+        np.save(os.path.join(directory, "rows.npy"), self.rows)
+        np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            groups = sorted(self.groups, key=self.groups.get)
+            json.dump({"digest": self.digest, "groups": groups}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a saved index; returns None if it is missing."""
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "rows.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "centroids.npy")),
+            meta["groups"],
+            np.load(os.path.join(directory, "offsets.npy")),
+            meta["digest"],
+        )
+
+    def search(self, query, group_key, k=3, nprobe=8):
+        """Row ids of the k most similar posts in a (language, length) group."""
+        g = self.groups.get(tuple(group_key))
+        if g is None:
+            return []
+        query_vector = embed_texts([query], self.vectors.shape[1])[0]
+        lists = len(self.centroids)
+        bounds = self.offsets[g * lists:(g + 1) * lists + 1]
+
+        candidates, scores = [], []
+        probed = 0
+        for cell in np.argsort(-(self.centroids @ query_vector)) if lists > 1 else [0]:
+            start, end = bounds[cell], bounds[cell + 1]
+            if end > start:
+                candidates.append(np.arange(start, end))
+                scores.append(self.vectors[start:end] @ query_vector)
+            probed += 1
+            if probed >= nprobe and sum(len(c) for c in candidates) >= k:
+                break
+        if not candidates:
+            return []
+
+        candidates, scores = np.concatenate(candidates), np.concatenate(scores)
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(self.rows[i]) for i in candidates[top]]
@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable
+
+
+class FakeLLMError(Exception):
+    """Error raised by FakeLLM; status_code mimics the provider's HTTP status."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def default_responder(prompt):
+    return f"Fake response to a {len(prompt)}-character prompt."
+
+
+class FakeLLM(Runnable):
+    """Deterministic local stand-in for ChatGroq.
+
+    latency: seconds before the first token; tokens_per_second: streaming rate
+    (0 means instant); error_rate / rate_limit_rate: chance of a 503 / 429 per call.
+    The responder maps the prompt text to the completion text.
+    """
+
+    def __init__(self, responder=default_responder, latency=0.0, tokens_per_second=0,
+                 error_rate=0.0, rate_limit_rate=0.0, seed=0, model_name="fake-llm"):
+        self.responder = responder
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.model_name = model_name
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_text(input):
+        if hasattr(input, "to_string"):
+            return input.to_string()
+        return str(input)
+
+    def _start_call(self):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+        time.sleep(self.latency)
+        if roll < self.rate_limit_rate:
+            raise FakeLLMError("Rate limit exceeded", status_code=429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeLLMError("Service unavailable", status_code=503)
+
+    def _tokens(self, text):
+        words = text.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = self._to_text(input)
+        self._start_call()
+        text = self.responder(prompt)
+        if self.tokens_per_second:
+            time.sleep(len(self._tokens(text)) / self.tokens_per_second)
+        return AIMessage(content=text)
+
+    def stream(self, input, config=None, **kwargs):
+        prompt = self._to_text(input)
+        self._start_call()
+        for token in self._tokens(self.responder(prompt)):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield AIMessageChunk(content=token)
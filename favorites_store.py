@@ -0,0 +1,134 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+FAVORITES_PATH = os.getenv("FAVORITES_PATH", "data/favorites.sqlite3")
+SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS favorites (
+    id INTEGER PRIMARY KEY,
+    post TEXT NOT NULL,
+    image TEXT NOT NULL DEFAULT '',
+    hashtags TEXT NOT NULL DEFAULT '',
+    tone TEXT,
+    topic TEXT,
+    language TEXT,
+    created_at REAL NOT NULL,
+    owner TEXT NOT NULL DEFAULT ''
+);
+DROP INDEX IF EXISTS favorites_tone;
+DROP INDEX IF EXISTS favorites_topic;
+DROP INDEX IF EXISTS favorites_language;
+DROP INDEX IF EXISTS favorites_created;
+CREATE INDEX IF NOT EXISTS favorites_owner_tone ON favorites (owner, tone, created_at);
+CREATE INDEX IF NOT EXISTS favorites_owner_topic ON favorites (owner, topic, created_at);
+CREATE INDEX IF NOT EXISTS favorites_owner_language ON favorites (owner, language, created_at);
+CREATE INDEX IF NOT EXISTS favorites_owner_created ON favorites (owner, created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS favorites_fts USING fts5(
+    post, hashtags, content='favorites', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS favorites_ai AFTER INSERT ON favorites BEGIN
+    INSERT INTO favorites_fts (rowid, post, hashtags) VALUES (new.id, new.post, new.hashtags);
+END;
+CREATE TRIGGER IF NOT EXISTS favorites_ad AFTER DELETE ON favorites BEGIN
+    INSERT INTO favorites_fts (favorites_fts, rowid, post, hashtags) VALUES ('delete', old.id, old.post, old.hashtags);
+END;
+"""
+
+
+def fts_query(search):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    return " ".join(f'"{term}"*' for term in SEARCH_TERM.findall(search))
+
+
+class FavoritesStore:
+    """Saved posts in SQLite, with metadata columns and an FTS5 index over the text.
+
+    Every favorite belongs to an owner (an opaque user id); reads, deletes and
+    clear() only ever see the given owner's favorites.
+    """
+
+    def __init__(self, path=FAVORITES_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(favorites)")}
+        if columns and "owner" not in columns:
+            # Stores created before favorites were per user
+            self._conn.execute("ALTER TABLE favorites ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add(self, post, image="", hashtags="", tone=None, topic=None, language=None, owner=""):
+        """Save a post for an owner and return its id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO favorites (post, image, hashtags, tone, topic, language, created_at, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (post, image or "", hashtags or "", tone, topic, language, time.time(), owner),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def query(self, search="", tone=None, topic=None, language=None, limit=10, offset=0, owner=""):
+        """Return (favorites, total) of an owner matching the search and filters, newest first.
+
+        Filters left as None (or "All") are not applied; search matches words in the
+        post text or hashtags.
+        """
+        clauses, params = ["owner = ?"], [owner]
+        match = fts_query(search)
+        if match:
+            clauses.append("id IN (SELECT rowid FROM favorites_fts WHERE favorites_fts MATCH ?)")
+            params.append(match)
+        for column, value in (("tone", tone), ("topic", topic), ("language", language)):
+            if value and value != "All":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM favorites {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM favorites {where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def topics(self, owner=""):
+        """Distinct topics that have at least one of the owner's favorites."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT topic FROM favorites WHERE owner = ? AND topic IS NOT NULL ORDER BY topic", (owner,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, owner=""):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM favorites WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def delete(self, favorite_id, owner=""):
+        with self._lock:
+            self._conn.execute("DELETE FROM favorites WHERE id = ? AND owner = ?", (favorite_id, owner))
+            self._conn.commit()
+
+    def clear(self, owner=""):
+        """Delete all of an owner's favorites; other owners' are untouched."""
+        with self._lock:
+            self._conn.execute("DELETE FROM favorites WHERE owner = ?", (owner,))
+            self._conn.commit()
+
+
+@lru_cache(maxsize=None)
+def get_favorites_store(path=FAVORITES_PATH):
+    """Return the favorites store for a path, shared by every session in the process (each sees only its owner's rows)."""
+    return FavoritesStore(path)
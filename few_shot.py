@@ -1,32 +1,132 @@
+import hashlib
 import json
-import pandas as pd
+import os
+import threading
+
+import numpy as np
+
+from corpus_store import columnar_path_for
+from dedup import DUPLICATE_THRESHOLD, DedupIndex
+from embeddings import EmbeddingIndex
+from telemetry import span
 
 
 class FewShotPosts:
-    def __init__(self, file_path="data/processed_posts.json"):
-        self.df = None
+    def __init__(self, file_path="data/processed_posts.json", source_digest=None):
+        self._df = None
+        self.file_path = file_path
+        self._source_digest = source_digest
+        self.posts = []
+        self.index = {}
         self.unique_tags = None
+        self.tag_counts = {}
+        self.embedding_dir = embedding_dir_for(file_path)
+        self.embedding_index = None
+        self.dedup_dir = dedup_dir_for(file_path)
+        self.dedup_index = None
+        self.loaded = False
+        self._index_locks = {"embedding_index": threading.Lock(), "dedup_index": threading.Lock()}
         self.load_posts(file_path)
 
     def load_posts(self, file_path):
+        columnar_path = columnar_path_for(file_path)
+        if is_fresh(columnar_path, file_path):
+            self.load_columnar(columnar_path)
+            return
+
         try:
             with open(file_path, encoding="utf-8") as f:
                 posts = json.load(f)
-                self.df = pd.json_normalize(posts)
 
-                # Categorize length for each post
-                self.df["length"] = self.df["line_count"].apply(self.categorize_length)
+                # Categorize length for each post; the raw records are what lookups return
+                for post, length in zip(posts, self.bucket_lengths([post.get("line_count") for post in posts])):
+                    post["length"] = length
+                self.posts = posts
 
-                # Extract unique tags from all posts
-                all_tags = self.df['tags'].dropna().apply(lambda x: x if isinstance(x, list) else []).sum()
-                self.unique_tags = set(all_tags)
+                # Every (row, tag) pair, as integer codes, for the index and the tag counts
+                tag_rows, tags = [], []
+                for row, post in enumerate(posts):
+                    for tag in post_tags(post):
+                        tag_rows.append(row)
+                        tags.append(tag)
+                tag_codes, tag_vocab = factorize(tags)
+                language_codes, languages = factorize([post.get("language") for post in posts])
+                length_codes, lengths = factorize([post["length"] for post in posts])
+                self.index = self.build_index_from_codes(
+                    language_codes, languages, length_codes, lengths, tag_rows, tag_codes, tag_vocab,
+                )
+                self.set_tag_counts(tag_vocab, np.bincount(tag_codes, minlength=len(tag_vocab)))
+                self.loaded = True
 
         except FileNotFoundError:
             print(f"File not found: {file_path}")
         except json.JSONDecodeError:
             print(f"Error decoding JSON from file: {file_path}")
 
-    def categorize_length(self, line_count):
+    def load_columnar(self, path):
+        """Memory-map the Arrow corpus and index it from dictionary codes; post text stays on disk until used."""
+        import pyarrow.compute as pc
+        from corpus_store import ColumnarCorpus, LazyPosts
+
+        corpus = ColumnarCorpus(path)
+        language = corpus.column("language")
+        length = corpus.column("length")
+        tags = corpus.column("tags")
+        tag_values = tags.flatten()
+
+        self.index = self.build_index_from_codes(
+            language.indices.to_numpy(zero_copy_only=False), language.dictionary.to_pylist(),
+            length.indices.to_numpy(zero_copy_only=False), length.dictionary.to_pylist(),
+            pc.list_parent_indices(tags).to_numpy(), tag_values.indices.to_numpy(zero_copy_only=False),
+            tag_values.dictionary.to_pylist(),
+        )
+        self.posts = LazyPosts(corpus)
+        tag_vocab = tag_values.dictionary.to_pylist()
+        tag_codes = tag_values.indices.to_numpy(zero_copy_only=False)
+        self.set_tag_counts(tag_vocab, np.bincount(tag_codes, minlength=len(tag_vocab)))
+        self.loaded = True
+
+    @property
+    def df(self):
+        """The corpus as a DataFrame, built on first access; lookups never need it (or pandas)."""
+        if self._df is None and self.loaded:
+            import pandas as pd
+
+            self._df = pd.DataFrame([self.posts[i] for i in range(len(self.posts))])
+        return self._df
+
+    def set_tag_counts(self, tags, counts):
+        """Record how many posts use each tag; also fills unique_tags."""
+        self.tag_counts = {tag: int(count) for tag, count in zip(tags, counts) if count}
+        self.unique_tags = set(self.tag_counts)
+
+    @staticmethod
+    def build_index_from_codes(language_codes, languages, length_codes, lengths, tag_rows, tag_codes, tags):
+        """Vectorized index build from integer codes.
+
+        tag_rows[i] is the row that the i-th (flattened) tag belongs to and
+        tag_codes[i] its code in `tags`. Duplicate tags within a row are dropped.
+        """
+        tag_rows = np.asarray(tag_rows, dtype=np.int64)
+        tag_codes = np.asarray(tag_codes, dtype=np.int64)
+        keys = (np.asarray(language_codes, dtype=np.int64)[tag_rows] * len(lengths)
+                + np.asarray(length_codes, dtype=np.int64)[tag_rows]) * len(tags) + np.asarray(tag_codes)
+        order = np.lexsort((tag_rows, keys))
+        keys, rows = keys[order], tag_rows[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys, rows = keys[keep], rows[keep].astype(np.int32)
+
+        unique_keys, starts = np.unique(keys, return_index=True)
+        index = {}
+        for key, ids in zip(unique_keys.tolist(), np.split(rows, starts[1:])):
+            key, tag = divmod(key, len(tags))
+            language, length = divmod(key, len(lengths))
+            index[(languages[language], lengths[length], tags[tag])] = ids
+        return index
+
+    @staticmethod
+    def categorize_length(line_count):
         try:
             if line_count < 5:
                 return "Short"
@@ -37,20 +137,161 @@ class FewShotPosts:
         except Exception:
             return "Unknown"
 
+    @staticmethod
+    def bucket_lengths(line_counts):
+        """Vectorized categorize_length over a list of line counts."""
+        counts = np.array([count if isinstance(count, (int, float)) else np.nan for count in line_counts], dtype=float)
+        return np.select([counts < 5, counts <= 10, counts > 10], ["Short", "Medium", "Long"], default="Unknown").tolist()
+
     def get_tags(self):
         return self.unique_tags or set()
 
+    def get_tag_counts(self):
+        return self.tag_counts
+
+    def get_tags_by_popularity(self):
+        """Tags ordered by how many posts use them, then alphabetically."""
+        return sorted(self.tag_counts, key=lambda tag: (-self.tag_counts[tag], tag))
+
     def get_filtered_posts(self, length, language, tag):
-        if self.df is None:
+        if not self.loaded:
+            print("Data not loaded properly.")
+            return []
+
+        with span("few_shot.filter"):
+            row_ids = self.index.get((language, length, tag))
+            if row_ids is None:
+                return []
+            return [self.posts[i] for i in row_ids]
+
+    def source_digest(self):
+        """sha256 of the corpus file, hashed at most once (get_few_shot_posts passes it in)."""
+        if self._source_digest is None:
+            self._source_digest = file_fingerprint(self.file_path)[1]
+        return self._source_digest
+
+    def load_saved_index(self, attr, index_class, directory, build):
+        """Load an index saved at ingestion into self.<attr>, once.
+
+        The index is stale when the file hash in its meta.json differs from the
+        corpus file's; then build(texts, digest) makes a fresh one in memory.
+        """
+        with self._index_locks[attr]:
+            if getattr(self, attr) is None:
+                digest = self.source_digest()
+                index = index_class.load(directory)
+                if index is None or index.digest != digest:
+                    print(f"{index_class.__name__} at {directory} is missing or stale; building it in memory.")
+                    index = build([post.get("text", "") for post in self.posts], digest)
+                setattr(self, attr, index)
+            return getattr(self, attr)
+
+    def get_embedding_index(self):
+        """Memory-map the embedding index saved at ingestion, or build it in memory if it is missing or stale."""
+        return self.load_saved_index("embedding_index", EmbeddingIndex, self.embedding_dir, lambda texts, digest: (
+            EmbeddingIndex.build(texts, [(post.get("language"), post.get("length")) for post in self.posts],
+                                 digest=digest)
+        ))
+
+    def get_similar_posts(self, query, length, language, k=3):
+        """Top-k posts by cosine similarity to the query text, within a language and length."""
+        if not self.loaded:
             print("Data not loaded properly.")
             return []
+        with span("few_shot.similar"):
+            row_ids = self.get_embedding_index().search(query, (language, length), k=k)
+            return [self.posts[i] for i in row_ids]
+
+    def get_dedup_index(self):
+        """Memory-map the MinHash index saved at ingestion, or build it in memory if it is missing or stale."""
+        return self.load_saved_index("dedup_index", DedupIndex, self.dedup_dir, DedupIndex.build)
+
+    def find_near_duplicates(self, text, threshold=DUPLICATE_THRESHOLD):
+        """(post, similarity) for corpus posts whose estimated Jaccard similarity to text reaches threshold."""
+        if not self.loaded:
+            return []
+        with span("few_shot.near_duplicates"):
+            return [(self.posts[row], score) for row, score in self.get_dedup_index().query(text, threshold)]
+
+
+def post_tags(post):
+    """A post's tags, skipping nulls; a bare string counts as one tag."""
+    tags = post.get("tags")
+    if isinstance(tags, list):
+        return [tag for tag in tags if tag is not None]
+    return [] if tags is None else [tags]
+
+
+def factorize(values):
+    """(codes, uniques): each value's position in the list of distinct values, in first-seen order."""
+    positions = {}
+    codes = np.fromiter((positions.setdefault(value, len(positions)) for value in values), dtype=np.int64,
+                        count=len(values))
+    return codes, list(positions)
+
+
+def is_fresh(derived_path, source_path):
+    """True if derived_path exists and is not older than source_path (or the source is gone)."""
+    try:
+        derived_mtime = os.stat(derived_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    try:
+        return derived_mtime >= os.stat(source_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def embedding_dir_for(file_path):
+    """data/processed_posts.json -> data/processed_posts.embeddings"""
+    return os.path.splitext(file_path)[0] + ".embeddings"
+
+
+def dedup_dir_for(file_path):
+    """data/processed_posts.json -> data/processed_posts.dedup"""
+    return os.path.splitext(file_path)[0] + ".dedup"
+
+
+_corpus_lock = threading.Lock()
+_corpus_cache = {}
+
+
+def file_fingerprint(file_path):
+    """Return (mtime, sha256) for a corpus file, or (None, None) if it is missing."""
+    try:
+        mtime = os.stat(file_path).st_mtime_ns
+        with open(file_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None, None
+    return mtime, digest
+
+
+def get_few_shot_posts(file_path="data/processed_posts.json"):
+    """Return the process-wide FewShotPosts, reloading only when the file changes.
+
+    The mtime is checked on every call; the file is only re-hashed when the mtime
+    moves, and only reloaded when the content hash differs.
+    """
+    with _corpus_lock:
+        cached = _corpus_cache.get(file_path)
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if cached and cached["mtime"] == mtime:
+            return cached["posts"]
+
+        mtime, digest = file_fingerprint(file_path)
+        if cached and cached["digest"] == digest:
+            cached["mtime"] = mtime
+            return cached["posts"]
 
-        df_filtered = self.df[
-            (self.df['language'] == language) &
-            (self.df['length'] == length) &
-            (self.df['tags'].apply(lambda tags: isinstance(tags, list) and tag in tags))
-        ]
-        return df_filtered.to_dict(orient="records")
+        with span("few_shot.load"):
+            posts = FewShotPosts(file_path, source_digest=digest)
+        _corpus_cache[file_path] = {"mtime": mtime, "digest": digest, "posts": posts}
+        return posts
 
 
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+import asyncio
+import copy
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from langchain_core.runnables import Runnable
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(exc):
+    """True for rate limits (429), server errors (5xx) and connection/timeouts."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # groq is only looked up, not imported: if nothing loaded it, exc cannot be one of its errors
+    groq = sys.modules.get("groq")
+    if groq is not None and isinstance(exc, groq.APIConnectionError):
+        return True
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retry(fn, retries=5, base_delay=0.5, max_delay=30.0, rate_limiter=None):
+    """Call fn(), retrying retryable errors with exponential backoff and full jitter."""
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+
+async def acall_with_retry(fn, retries=5, base_delay=0.5, max_delay=30.0, rate_limiter=None):
+    """Async counterpart of call_with_retry; fn returns an awaitable."""
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            await asyncio.to_thread(rate_limiter.acquire)
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `cooldown`
+    seconds one trial call is let through (half-open) to decide whether to close.
+    A trial that never reports back (e.g. a cancelled call) expires after another cooldown."""
+
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            if state == "half-open" and (self._trial_started is None or now - self._trial_started >= self.cooldown):
+                self._trial_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_started = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class AllModelsUnavailable(RuntimeError):
+    """Every model's circuit is open, or every model failed."""
+
+
+class LLMGateway(Runnable):
+    """Runnable front door for one or more chat models, tried in order.
+
+    Every call holds a slot of a global concurrency limit, retries retryable
+    errors with jittered backoff, and records the outcome in a per-model circuit
+    breaker. When the primary's retries are exhausted (or its circuit is open)
+    the call fails over to the next model. Supports invoke/ainvoke/stream/astream
+    and binding, so it drops in wherever the ChatGroq instance was used.
+    """
+
+    def __init__(self, models, max_concurrency=8, retries=2, base_delay=0.5, max_delay=8.0,
+                 breaker_threshold=5, breaker_cooldown=30.0):
+        self.models = list(models)
+        self.model_name = self.models[0][0]
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = None
+        self.breakers = {name: CircuitBreaker(breaker_threshold, breaker_cooldown) for name, _ in self.models}
+        self.stats = Counter()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = {}
+
+    def with_limits(self, retries=None, rate_limiter=None):
+        """A view of this gateway with its own retry count and/or a rate limiter for every attempt.
+
+        Breakers, stats and the concurrency limit stay shared with the original.
+        """
+        view = copy.copy(self)
+        if retries is not None:
+            view.retries = retries
+        if rate_limiter is not None:
+            view.rate_limiter = rate_limiter
+        return view
+
+    def retry_after(self):
+        """Seconds until the next open circuit lets a trial call through (0 if one is not open)."""
+        now = time.monotonic()
+        return min(max(0.0, breaker.cooldown - (now - breaker.opened_at)) if breaker.opened_at is not None else 0.0
+                   for breaker in self.breakers.values())
+
+    def _candidates(self):
+        """Yield the models to try, in order, asking each breaker only when that model's turn comes.
+
+        Asking up front would claim the half-open trial of every fallback even when
+        the primary answers, leaving those breakers stuck waiting on a trial that
+        never runs.
+        """
+        tried = False
+        for name, model in self.models:
+            if not self.breakers[name].allow():
+                self.stats["circuit_skips"] += 1
+                continue
+            if tried:
+                self.stats["failovers"] += 1
+            tried = True
+            yield name, model
+        if not tried:
+            raise AllModelsUnavailable("All LLM circuits are open")
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_semaphores:
+            self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._async_semaphores[loop]
+
+    def _failed(self, name, error):
+        """Record a failed attempt; non-retryable errors (bad requests) are re-raised without counting against the model."""
+        if not is_retryable(error):
+            self.breakers[name].record_success()
+            raise error
+        self.breakers[name].record_failure()
+        self.stats["failures"] += 1
+        print(f"LLM {name} unavailable ({error})")
+        return error
+
+    def invoke(self, input, config=None, **kwargs):
+        with self._semaphore:
+            error = None
+            for name, model in self._candidates():
+                target = model.bind(**kwargs) if kwargs else model
+                try:
+                    result = call_with_retry(lambda: target.invoke(input, config), self.retries,
+                                             self.base_delay, self.max_delay, self.rate_limiter)
+                except Exception as e:
+                    error = self._failed(name, e)
+                    continue
+                self.breakers[name].record_success()
+                self.stats["calls"] += 1
+                return result
+            raise error
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        async with self._async_semaphore():
+            error = None
+            for name, model in self._candidates():
+                target = model.bind(**kwargs) if kwargs else model
+                try:
+                    result = await acall_with_retry(lambda: target.ainvoke(input, config), self.retries,
+                                                    self.base_delay, self.max_delay, self.rate_limiter)
+                except Exception as e:
+                    error = self._failed(name, e)
+                    continue
+                self.breakers[name].record_success()
+                self.stats["calls"] += 1
+                return result
+            raise error
+
+    def stream(self, input, config=None, **kwargs):
+        """Stream from the first healthy model; failover only happens before the first chunk."""
+        with self._semaphore:
+            error = None
+            for name, model in self._candidates():
+                target = model.bind(**kwargs) if kwargs else model
+
+                def first_chunk():
+                    chunks = iter(target.stream(input, config))
+                    return chunks, next(chunks, None)
+
+                try:
+                    chunks, first = call_with_retry(first_chunk, self.retries, self.base_delay, self.max_delay,
+                                                    self.rate_limiter)
+                except Exception as e:
+                    error = self._failed(name, e)
+                    continue
+                self.breakers[name].record_success()
+                self.stats["calls"] += 1
+                if first is not None:
+                    yield first
+                    yield from chunks
+                return
+            raise error
+
+    async def astream(self, input, config=None, **kwargs):
+        async with self._async_semaphore():
+            error = None
+            for name, model in self._candidates():
+                target = model.bind(**kwargs) if kwargs else model
+
+                async def first_chunk():
+                    chunks = aiter(target.astream(input, config))
+                    return chunks, await anext(chunks, None)
+
+                try:
+                    chunks, first = await acall_with_retry(first_chunk, self.retries, self.base_delay,
+                                                           self.max_delay, self.rate_limiter)
+                except Exception as e:
+                    error = self._failed(name, e)
+                    continue
+                self.breakers[name].record_success()
+                self.stats["calls"] += 1
+                if first is not None:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+                return
+            raise error
+
+    def status(self):
+        """Circuit state per model plus call/failure/failover counters."""
+        return {"circuits": {name: breaker.state for name, breaker in self.breakers.items()}, **self.stats}
@@ -1,12 +1,219 @@
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from response_cache import SingleFlight, create_cache, make_key
+from telemetry import increment, span
 
 import os
+import re
+import threading
+import time
+from functools import lru_cache
 
 load_dotenv()
 
-llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model_name="meta-llama/llama-4-scout-17b-16e-instruct")
+MODEL_NAME = os.getenv("LLM_PRIMARY_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+FALLBACK_MODEL_NAME = os.getenv("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+
+@lru_cache(maxsize=None)
+def get_http_clients():
+    """Connection-pooled sync and async HTTP clients shared by every model."""
+    import httpx
+
+    limits = httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY)
+    return httpx.Client(limits=limits, timeout=LLM_TIMEOUT), httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_llm(model_name=MODEL_NAME):
+    """Return the single ChatGroq client for a model, shared by every session in the process.
+
+    Retries are handled by the gateway, so the SDK's own retries are disabled.
+    """
+    from langchain_groq import ChatGroq
+
+    http_client, http_async_client = get_http_clients()
+    return ChatGroq(
+        groq_api_key=os.getenv("GROQ_API_KEY"),
+        model_name=model_name,
+        base_url=GROQ_BASE_URL,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def get_gateway():
+    """Primary model with optional failover, behind one concurrency limit and circuit breakers."""
+    from llm_gateway import LLMGateway
+
+    names = [MODEL_NAME] + ([FALLBACK_MODEL_NAME] if FALLBACK_MODEL_NAME and FALLBACK_MODEL_NAME != MODEL_NAME else [])
+    return LLMGateway(
+        [(name, get_llm(name)) for name in names],
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        retries=LLM_MAX_RETRIES,
+        breaker_threshold=LLM_BREAKER_THRESHOLD,
+        breaker_cooldown=LLM_BREAKER_COOLDOWN,
+    )
+
+
+# The client stack (langchain_groq, groq, httpx) takes about a second to import, so the
+# shared gateway is built on first use. Assign llm to swap in another model.
+llm = None
+_llm_lock = threading.Lock()
+
+
+def shared_llm():
+    """Return the process-wide gateway, building it on the first call."""
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                llm = get_gateway()
+    return llm
+
+
+response_cache = create_cache(
+    backend=os.getenv("RESPONSE_CACHE", "memory"),
+    max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    path=os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite3"),
+)
+inflight = SingleFlight()
+
+
+def complete(prompt, use_cache=True, info=None, write_cache=True, **params):
+    """Return the stripped completion for a prompt, served from the response cache when possible.
+
+    Pass use_cache=False to force a fresh call (the result still refreshes the cache
+    unless write_cache=False, for results that must only ever be served once).
+    Extra params (e.g. temperature, seed) are bound to the model and become part
+    of the cache key. With caching on, identical requests already in flight
+    share that one upstream call instead of starting their own.
+    If a dict is passed as info, it receives "cached" and "coalesced" (the result
+    came from another caller's in-flight request).
+    """
+    info = {} if info is None else info
+    with span("llm.complete") as attrs:
+        key = make_key(prompt, MODEL_NAME, params)
+        if use_cache:
+            cached = response_cache.get(key)
+            record_cache_lookup(attrs, cached is not None)
+            if cached is not None:
+                info.update(cached=True, coalesced=False)
+                return cached
+
+        fetched = []
+
+        def fetch():
+            fetched.append(True)
+            model = shared_llm().bind(**params) if params else shared_llm()
+            text = model.invoke(prompt).content.strip()
+            record_tokens(attrs, prompt, text)
+            if write_cache:
+                response_cache.set(key, text)
+            return text
+
+        text = inflight.do(key, fetch) if use_cache else fetch()
+        info.update(cached=False, coalesced=not fetched)
+        return text
+
+
+def record_cache_lookup(attrs, hit):
+    attrs["cache_hit"] = hit
+    increment("response_cache_hits_total" if hit else "response_cache_misses_total")
+
+
+def record_tokens(attrs, prompt, completion):
+    attrs["prompt_tokens"] = count_tokens(prompt)
+    attrs["completion_tokens"] = count_tokens(completion)
+    increment("llm_prompt_tokens_total", attrs["prompt_tokens"])
+    increment("llm_completion_tokens_total", attrs["completion_tokens"])
+
+
+def stream_and_cache(prompt, key, attrs):
+    parts = []
+    for chunk in shared_llm().stream(prompt):
+        parts.append(chunk.content)
+        yield chunk.content
+    text = "".join(parts).strip()
+    record_tokens(attrs, prompt, text)
+    response_cache.set(key, text)
+
+
+def stream_complete(prompt, use_cache=True, timings=None):
+    """Yield the completion for a prompt chunk by chunk.
+
+    A cached response is yielded in one piece. The full text is cached once the
+    stream finishes, and concurrent identical streams share one upstream call.
+    If a dict is passed as timings, it receives "ttft" (seconds to first chunk),
+    "total", "cached" and "coalesced" (replayed from another caller's stream).
+    """
+    timings = {} if timings is None else timings
+    with span("llm.stream") as attrs:
+        start = time.perf_counter()
+        key = make_key(prompt, MODEL_NAME)
+        if use_cache:
+            cached = response_cache.get(key)
+            record_cache_lookup(attrs, cached is not None)
+            if cached is not None:
+                timings.update(ttft=time.perf_counter() - start, total=time.perf_counter() - start, cached=True,
+                               coalesced=False)
+                yield cached
+                return
+
+        fetched = []
+
+        def fetch():
+            fetched.append(True)
+            return stream_and_cache(prompt, key, attrs)
+
+        chunks = inflight.stream(key, fetch) if use_cache else fetch()
+        first = True
+        for chunk in chunks:
+            if first:
+                timings["ttft"] = attrs["ttft_s"] = time.perf_counter() - start
+                first = False
+            yield chunk
+
+        timings.update(total=time.perf_counter() - start, cached=False, coalesced=not fetched)
+
+
+# Local token estimate: no tokenizer for the hosted model ships offline, so this
+# approximates BPE behaviour (short Latin words ~1 token, long ones more, digits
+# in groups of 3, every other non-space character - incl. Tamil/Sinhala - 1 token).
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+|\n+|[^\sA-Za-z\d]")
+
+
+def piece_tokens(piece):
+    if piece[0].isascii() and piece[0].isalpha():
+        return 1 + len(piece) // 7
+    if piece[0].isdigit():
+        return (len(piece) + 2) // 3
+    return 1
+
+
+def count_tokens(text):
+    """Estimate how many model tokens a text uses."""
+    return sum(piece_tokens(match.group()) for match in TOKEN_PIECE.finditer(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to at most max_tokens (estimated), marking the cut with an ellipsis."""
+    used = 0
+    for match in TOKEN_PIECE.finditer(text):
+        used += piece_tokens(match.group())
+        if used > max_tokens - 1:
+            return text[:match.start()].rstrip() + "…"
+    return text
+
 
 if __name__ == "__main__":
-    response = llm.invoke("What are the two main ingredients in samosa")
+    response = shared_llm().invoke("What are the two main ingredients in samosa")
     print(response.content)
\ No newline at end of file
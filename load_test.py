@@ -0,0 +1,135 @@
+"""Load-test the HTTP API against the local stub LLM.
+
+    python load_test.py --workers 4 --requests 2000 --concurrency 128 --latency 0.3
+
+Starts stub_llm_server in-process and api.py as a multi-worker uvicorn
+subprocess pointed at it, fires requests, and prints one JSON line with
+requests/s, status counts and latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from stub_llm_server import start_stub_server
+
+PAYLOADS = {
+    "generate": {"length": "Medium", "language": "English", "tag": "Job Search", "tone": "Professional"},
+    "rewrite": {"text": "I just finished my first marathon.\nIt took months of early mornings.",
+                "length": "Short", "language": "English", "tone": "Inspirational"},
+    "feedback": {"text": "I just finished my first marathon.\nIt took months of early mornings."},
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+async def wait_until_ready(client, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"API at {url} did not become ready within {timeout}s")
+
+
+async def one_request(client, url, endpoint, payload, stream):
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        if not stream:
+            response = await client.post(f"{url}/{endpoint}", json=payload)
+            return response.status_code, time.perf_counter() - start, None
+        async with client.stream("POST", f"{url}/{endpoint}?stream=1", json=payload) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            return response.status_code, time.perf_counter() - start, first_byte
+    except httpx.TransportError as e:
+        return type(e).__name__, time.perf_counter() - start, None
+
+
+async def run(args, url):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        await wait_until_ready(client, url)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def worker(i):
+            payload = PAYLOADS[args.endpoint] | {"use_cache": False}
+            if args.endpoint == "generate":
+                payload["tag"] = f"Job Search {i}"
+            async with semaphore:
+                return await one_request(client, url, args.endpoint, payload, args.stream)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [(duration, ttfb) for status, duration, ttfb in results if status == 200]
+    durations = [duration for duration, _ in ok]
+    report = {
+        "endpoint": args.endpoint,
+        "stream": args.stream,
+        "workers": args.workers,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "stub_latency_s": args.latency,
+        "seconds": round(elapsed, 2),
+        "requests_per_s": round(len(ok) / elapsed, 1),
+        "statuses": statuses,
+        "p50_ms": round(percentile(durations, 0.5) * 1000, 1) if durations else None,
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 1) if durations else None,
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 1) if durations else None,
+    }
+    if args.stream and ok:
+        report["ttfb_p50_ms"] = round(percentile([ttfb for _, ttfb in ok], 0.5) * 1000, 1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test api.py against a stub LLM.")
+    parser.add_argument("--endpoint", choices=sorted(PAYLOADS), default="generate")
+    parser.add_argument("--stream", action="store_true", help="Use the server-sent events variant")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-in-flight", type=int, default=32, help="API_MAX_CONCURRENCY per worker")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub seconds before each response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stub share of 503 responses")
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(latency=args.latency, token_delay=args.token_delay,
+                                       error_rate=args.error_rate)
+    env = os.environ | {
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": stub_url,
+        "LLM_FALLBACK_MODEL": "",
+        "LLM_MAX_CONCURRENCY": str(args.max_in_flight),
+        "API_MAX_CONCURRENCY": str(args.max_in_flight),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "api.py", "--port", str(args.port), "--workers", str(args.workers)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        print(json.dumps(asyncio.run(run(args, f"http://127.0.0.1:{args.port}"))))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stub.shutdown()
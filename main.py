@@ -1,43 +1,131 @@
+import os
+import time
+import uuid
 import streamlit as st
-from few_shot import FewShotPosts
-from post_generator import generate_post, rewrite_post
-from llm_helper import llm
-import re
+from few_shot import get_few_shot_posts
+from favorites_store import get_favorites_store
+from post_generator import (
+    generate_post_stream,
+    generate_posts_fanout,
+    rewrite_post_stream,
+    get_feedback_stream,
+    check_originality,
+    COPY_THRESHOLD,
+    ERROR_PREFIXES,
+    LENGTH_OPTIONS,
+    LANGUAGE_OPTIONS,
+    TONE_OPTIONS
+)
+from llm_helper import inflight, response_cache
+from post_parser import PostStreamParser, parse_posts
+from prewarm import get_prewarmer
+from telemetry import span, start_metrics_server, telemetry, traced
 
 # -------------------- INIT --------------------
-if "favorites" not in st.session_state:
-    st.session_state.favorites = []
-
 if "generated_posts" not in st.session_state:
     st.session_state.generated_posts = []
 
+if "favorites_page" not in st.session_state:
+    st.session_state.favorites_page = 1
+
 # -------------------- OPTIONS --------------------
-length_options = ["Short", "Medium", "Long", "Custom"]
-language_options = ["English", "Tamil", "Sinhala"]
-tone_options = ["Professional", "Inspirational", "Conversational", "Humorous", "Motivational"]
+length_options = LENGTH_OPTIONS
+language_options = LANGUAGE_OPTIONS
+tone_options = TONE_OPTIONS
+FAVORITES_PAGE_SIZE = 10
 
 # -------------------- UTIL --------------------
+@traced("parse")
 def extract_posts(raw_output):
     """
     Extracts post content, image idea, and hashtags from LLM output.
     Returns a list of tuples: (post_content, image_idea, hashtags)
     """
-    if not isinstance(raw_output, str):
-        raw_output = str(raw_output)
-
-    pattern = r"Post\s*\d+:\s*(.*?)\s*Image Idea\s*\d+:\s*(.*?)\s*(#[^\n]+(?:\s*#[^\n]+)*)"
-    matches = re.findall(pattern, raw_output, re.DOTALL)
-
-    posts = []
-    for match in matches[:3]:  # Limit to 3 posts
-        post_body = match[0].strip()
-        image_idea = match[1].strip()
-        hashtags = match[2].strip()
-        posts.append((post_body, image_idea, hashtags))
+    posts, issues = parse_posts(raw_output, max_posts=3)  # Limit to 3 posts
+    for issue in issues:
+        st.warning(f"Output format issue: {issue}")
+    return posts
+
+def show_failure(raw_output):
+    """Show a failed or rejected request instead of parsing it; True if raw_output was one."""
+    if not raw_output.startswith(ERROR_PREFIXES):
+        return False
+    if raw_output.startswith("⚠️ Warning"):
+        st.warning(raw_output)
+    else:
+        st.error(raw_output)
+    return True
+
+@traced("parse")
+def finish_parsing(parser):
+    """Flush a stream parser and surface any malformed sections."""
+    parser.close()
+    for issue in parser.issues:
+        st.warning(f"Output format issue: {issue}")
+    return parser.posts
+
+def render_admin_panel():
+    """Per-stage latency percentiles and counters, shown only with ?admin=1 or ADMIN_PANEL=1."""
+    if st.query_params.get("admin") != "1" and os.getenv("ADMIN_PANEL") != "1":
+        return
+    with st.expander("Admin: pipeline latency", expanded=False):
+        st.dataframe(telemetry.percentiles(), hide_index=True)
+        counters = dict(telemetry.counters)
+        if counters:
+            st.json({name: counters[name] for name in sorted(counters)})
+        st.caption("Prewarmed pool")
+        st.json(get_prewarmer().status())
+        st.caption("Prometheus metrics are served on METRICS_PORT when it is set.")
+
+def flag_copied_posts(posts, reused=None):
+    """Warn about generated posts that nearly copy a corpus example or an earlier generation.
+
+    reused[i] marks post i as served from the response cache or a shared in-flight
+    call; those are an earlier generation themselves, so only the corpus check applies.
+    """
+    for i, (post, _, _) in enumerate(posts, start=1):
+        originality = check_originality(post, check_recent=not (reused and reused[i - 1]))
+        if originality["corpus_match"] is not None:
+            st.warning(f"Post {i} closely copies an existing example "
+                       f"({originality['corpus_similarity']:.0%} similar). Consider regenerating.")
+        elif originality["recent_similarity"] >= COPY_THRESHOLD:
+            st.info(f"Post {i} repeats an earlier generation ({originality['recent_similarity']:.0%} similar).")
     return posts
 
-def save_to_favorites(post, image, hashtags):
-    st.session_state.favorites.append({"post": post, "image": image, "hashtags": hashtags})
+def render_fanout(results, reused_variants=frozenset()):
+    """Show fan-out posts in the order they finish, then return them for the main list.
+
+    Also returns, per post, whether its variant is in reused_variants.
+    """
+    posts, reused = [], []
+    placeholder = st.empty()
+    with placeholder.container():
+        st.caption("Crafting your posts in parallel...")
+        for variant, raw_output in results:
+            if show_failure(raw_output):
+                continue
+            parsed, issues = parse_posts(raw_output, max_posts=1)
+            for issue in issues:
+                st.warning(f"Output format issue: {issue}")
+            for post, _, _ in parsed:
+                st.markdown(f"#### Post {len(posts) + 1}")
+                st.markdown(render_post_box(post), unsafe_allow_html=True)
+            posts.extend(parsed)
+            reused.extend([variant in reused_variants] * len(parsed))
+    placeholder.empty()
+    return posts, reused
+
+def favorites_owner():
+    """Favorites belong to the signed-in user; without sign-in, to a random id kept in the page URL."""
+    if st.user.get("is_logged_in") and st.user.get("email"):
+        return st.user.get("email")
+    if "favorites" not in st.query_params:
+        st.query_params["favorites"] = uuid.uuid4().hex
+    return st.query_params["favorites"]
+
+def save_to_favorites(post, image, hashtags, tone=None, topic=None, language=None):
+    get_favorites_store().add(post, image, hashtags, tone=tone, topic=topic, language=language,
+                              owner=st.session_state.favorites_owner)
     st.toast("Post saved to favorites.")
 
 def render_post_box(text: str) -> str:
@@ -61,15 +149,56 @@ def render_post_box(text: str) -> str:
     """
 
 def clear_favorites():
-    st.session_state.favorites.clear()
+    get_favorites_store().clear(owner=st.session_state.favorites_owner)
+    st.session_state.favorites_page = 1
     st.toast("All favorites cleared.")
 
+def stream_to_screen(chunks, label, parser=None, timings=None):
+    """Render streamed chunks live, then clear them and return the full text.
+
+    If a PostStreamParser is given, every chunk is also fed to it and each post
+    is announced as soon as it is complete. Pass a dict as timings to keep the
+    stream's timings (and whether it was cached or coalesced).
+    """
+    timings = {} if timings is None else timings
+    placeholder = st.empty()
+    with placeholder.container():
+        st.caption(label)
+        progress = st.empty()
+
+        def tee():
+            for chunk in chunks(timings):
+                if parser is not None and parser.feed(chunk):
+                    progress.caption(f"{len(parser.posts)} post(s) ready...")
+                yield chunk
+
+        text = st.write_stream(tee())
+    placeholder.empty()
+
+    if "total" in timings:
+        source = "cache" if timings.get("cached") else "model"
+        st.caption(f"First token in {timings.get('ttft', 0):.2f}s · completed in {timings['total']:.2f}s ({source})")
+    return text if isinstance(text, str) else "".join(map(str, text))
+
+def was_reused(timings):
+    """True if a stream was replayed from the cache or another session's identical request."""
+    return bool(timings.get("cached") or timings.get("coalesced"))
+
 # -------------------- MAIN APP --------------------
 def main():
+    rerun_start = time.perf_counter()
+    start_metrics_server()
+    prewarmer = get_prewarmer()
     st.set_page_config(page_title="LinkedIn Post Generator", layout="centered")
     st.markdown("<h1 style='text-align:center;'>LinkedIn Post Generator</h1>", unsafe_allow_html=True)
-
-    fs = FewShotPosts()
+    if "favorites_owner" not in st.session_state:
+        st.session_state.favorites_owner = favorites_owner()
+
+    fs = get_few_shot_posts()
+    use_cache = not st.sidebar.checkbox(
+        "Fresh variations (skip cache)",
+        help="Always call the model instead of reusing an identical earlier response."
+    )
     tabs = st.tabs([
         "Generate Post",
         "Rewrite Post",
@@ -83,7 +212,7 @@ def main():
 
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            selected_tag = st.selectbox("Topic", options=sorted(fs.get_tags()))
+            selected_tag = st.selectbox("Topic", options=fs.get_tags_by_popularity())
         with col2:
             selected_length = st.selectbox("Post Length", options=length_options)
         with col3:
@@ -95,33 +224,77 @@ def main():
         if selected_length == "Custom":
             custom_line_count = st.number_input("Custom line count", min_value=1, max_value=200, step=1)
 
+        fan_out = st.checkbox(
+            "Generate posts in parallel",
+            help="Send three smaller single-post requests at once and show each post as soon as it is ready."
+        )
+
         if st.button("Generate Post"):
             if custom_line_count and custom_line_count > 30:
                 st.warning("⚠️ Custom line count cannot exceed 30. Please enter a value below 30.")
                 st.stop()
 
-            with st.spinner("Crafting your post..."):
-                raw_output = generate_post(selected_length, selected_language, selected_tag, selected_tone, custom_line_count)
+            # Saved favorites are labelled with the selection the posts were generated for
+            st.session_state.generated_posts_meta = dict(
+                tone=selected_tone, topic=selected_tag, language=selected_language
+            )
+            pooled = prewarmer.take(selected_length, selected_language, selected_tag, selected_tone, custom_line_count)
+            if pooled is not None:
+                st.caption("Served instantly from posts prepared in the background.")
+                st.session_state.generated_posts = flag_copied_posts(extract_posts(pooled))
+            elif fan_out:
+                reused_variants = set()
+                st.session_state.generated_posts = flag_copied_posts(*render_fanout(
+                    generate_posts_fanout(
+                        selected_length,
+                        selected_language,
+                        selected_tag,
+                        selected_tone,
+                        custom_line_count,
+                        use_cache=use_cache,
+                        reused=reused_variants
+                    ),
+                    reused_variants
+                ))
+            else:
+                parser = PostStreamParser(max_posts=3)
+                timings = {}
+                raw_output = stream_to_screen(
+                    lambda timings: generate_post_stream(
+                        selected_length,
+                        selected_language,
+                        selected_tag,
+                        selected_tone,
+                        custom_line_count,
+                        use_cache=use_cache,
+                        timings=timings
+                    ),
+                    "Crafting your post...",
+                    parser,
+                    timings
+                )
 
-                if isinstance(raw_output, str) and raw_output.startswith("⚠️ Warning"):
-                    st.warning(raw_output)
+                if show_failure(raw_output):
                     st.session_state.generated_posts = []
                 else:
-                    st.session_state.generated_posts = extract_posts(raw_output)
-
-        if st.session_state.generated_posts:
-            st.markdown("### Generated Posts")
-            for i, (post, image, hashtags) in enumerate(st.session_state.generated_posts, start=1):
-                st.markdown(f"#### Post {i}")
-                st.markdown(render_post_box(post), unsafe_allow_html=True)
-                st.markdown(f"**Hashtags:** {hashtags}")
-                st.markdown(f"**Image Suggestion:** _{image}_")
-                st.button(
-                    f"Save Post {i} to Favorites",
-                    key=f"save_btn_{i}",
-                    on_click=save_to_favorites,
-                    args=(post, image, hashtags)
-                )
+                    posts = finish_parsing(parser)
+                    st.session_state.generated_posts = flag_copied_posts(posts, [was_reused(timings)] * len(posts))
+
+        with span("render"):
+            if st.session_state.generated_posts:
+                st.markdown("### Generated Posts")
+                for i, (post, image, hashtags) in enumerate(st.session_state.generated_posts, start=1):
+                    st.markdown(f"#### Post {i}")
+                    st.markdown(render_post_box(post), unsafe_allow_html=True)
+                    st.markdown(f"**Hashtags:** {hashtags}")
+                    st.markdown(f"**Image Suggestion:** _{image}_")
+                    st.button(
+                        f"Save Post {i} to Favorites",
+                        key=f"save_btn_{i}",
+                        on_click=save_to_favorites,
+                        args=(post, image, hashtags),
+                        kwargs=st.session_state.get("generated_posts_meta", {})
+                    )
 
     # -------------------- TAB 2: Rewrite --------------------
     with tabs[1]:
@@ -159,17 +332,22 @@ def main():
                 st.warning("⚠️ Custom line count for rewrite cannot exceed 30. Please enter a value below 30.")
                 st.stop()
 
-            with st.spinner("Rewriting your post..."):
-                rewritten = rewrite_post(
+            rewritten = stream_to_screen(
+                lambda timings: rewrite_post_stream(
                     original_post,
                     rewrite_length,
                     rewrite_language,
                     rewrite_tone,
-                    custom_line_count_rewrite
-                )
+                    custom_line_count_rewrite,
+                    use_cache=use_cache,
+                    timings=timings
+                ),
+                "Rewriting your post..."
+            )
 
-            st.subheader("Rewritten Post")
-            st.markdown(render_post_box(rewritten.strip()), unsafe_allow_html=True)
+            if not show_failure(rewritten):
+                st.subheader("Rewritten Post")
+                st.markdown(render_post_box(rewritten.strip()), unsafe_allow_html=True)
 
     # -------------------- TAB 3: AI Feedback --------------------
     with tabs[2]:
@@ -185,16 +363,13 @@ def main():
             if not feedback_input.strip():
                 st.warning("Please paste a LinkedIn post to analyze.")
             else:
-                with st.spinner("Analyzing your post..."):
-                    prompt = f"""
-Analyze the following LinkedIn post and give 3 clear and actionable tips to improve engagement. Be concise and helpful.
-
-Post:
-\"\"\"{feedback_input.strip()}\"\"\""""
-                    response = llm.invoke(prompt)
-                    feedback = response.content.strip()
-                st.subheader("AI Suggestions")
-                st.markdown(render_post_box(feedback), unsafe_allow_html=True)
+                feedback = stream_to_screen(
+                    lambda timings: get_feedback_stream(feedback_input, use_cache=use_cache, timings=timings),
+                    "Analyzing your post..."
+                ).strip()
+                if not show_failure(feedback):
+                    st.subheader("AI Suggestions")
+                    st.markdown(render_post_box(feedback), unsafe_allow_html=True)
 
     # -------------------- TAB 4: Generate from Bullets --------------------
     with tabs[3]:
@@ -232,61 +407,84 @@ Post:
                 st.warning("⚠️ Custom line count for bullets cannot exceed 30. Please enter a value below 30.")
                 st.stop()
 
-            with st.spinner("Crafting post from your ideas..."):
-                raw_output = generate_post(
+            st.session_state.generated_bullet_posts_meta = dict(
+                tone=selected_tone_bullet, language=selected_language_bullet
+            )
+            parser = PostStreamParser(max_posts=3)
+            timings = {}
+            raw_output = stream_to_screen(
+                lambda timings: generate_post_stream(
                     selected_length_bullet,
                     selected_language_bullet,
                     bullet_input,
                     selected_tone_bullet,
-                    custom_line_count_bullet
-                )
+                    custom_line_count_bullet,
+                    use_cache=use_cache,
+                    timings=timings
+                ),
+                "Crafting post from your ideas...",
+                parser,
+                timings
+            )
 
-                if isinstance(raw_output, str) and raw_output.startswith("⚠️ Warning"):
-                    st.warning(raw_output)
-                else:
-                    st.session_state.generated_bullet_posts = extract_posts(raw_output)
+            if not show_failure(raw_output):
+                posts = finish_parsing(parser)
+                st.session_state.generated_bullet_posts = flag_copied_posts(posts, [was_reused(timings)] * len(posts))
 
         # Display stored bullet-generated posts
-        if st.session_state.generated_bullet_posts:
-            st.subheader("Generated Posts from Bullets")
-            for i, (post, image, hashtags) in enumerate(st.session_state.generated_bullet_posts, start=1):
-                st.markdown(f"#### Post {i}")
-                st.markdown(render_post_box(post), unsafe_allow_html=True)
-                st.markdown(f"**Hashtags:** {hashtags}")
-                st.markdown(f"**Image Suggestion:** _{image}_")
-                st.button(
-                    f"Save Bullet Post {i} to Favorites",
-                    key=f"save_bullet_btn_{i}",
-                    on_click=save_to_favorites,
-                    args=(post, image, hashtags)
-                )
+        with span("render"):
+            if st.session_state.generated_bullet_posts:
+                st.subheader("Generated Posts from Bullets")
+                for i, (post, image, hashtags) in enumerate(st.session_state.generated_bullet_posts, start=1):
+                    st.markdown(f"#### Post {i}")
+                    st.markdown(render_post_box(post), unsafe_allow_html=True)
+                    st.markdown(f"**Hashtags:** {hashtags}")
+                    st.markdown(f"**Image Suggestion:** _{image}_")
+                    st.button(
+                        f"Save Bullet Post {i} to Favorites",
+                        key=f"save_bullet_btn_{i}",
+                        on_click=save_to_favorites,
+                        args=(post, image, hashtags),
+                        kwargs=st.session_state.get("generated_bullet_posts_meta", {})
+                    )
 
     # -------------------- SIDEBAR: FAVORITES --------------------
     with st.sidebar.expander("Saved Favorites", expanded=True):
         st.markdown("### Favorite Posts")
 
-        if st.session_state.favorites:
+        favorites = get_favorites_store()
+        owner = st.session_state.favorites_owner
+        if favorites.count(owner):
             search_query = st.text_input("Search by keyword:")
             filter_tone = st.selectbox("Filter by Tone", options=["All"] + tone_options)
-            filter_topic = st.selectbox("Filter by Topic", options=["All"] + sorted(fs.get_tags()))
+            filter_topic = st.selectbox("Filter by Topic", options=["All"] + favorites.topics(owner))
             filter_lang = st.selectbox("Filter by Language", options=["All"] + language_options)
 
-            def post_matches_filters(fav):
-                return (
-                    search_query.lower() in fav["post"].lower() and
-                    (filter_tone == "All" or filter_tone.lower() in fav["post"].lower()) and
-                    (filter_topic == "All" or filter_topic.lower() in fav["post"].lower()) and
-                    (filter_lang == "All" or filter_lang.lower() in fav["post"].lower())
-                )
-
-            filtered_favorites = [f for f in st.session_state.favorites if post_matches_filters(f)]
+            # Filtering and paging happen in SQLite, so only one page is ever loaded.
+            filters = dict(search=search_query, tone=filter_tone, topic=filter_topic, language=filter_lang, owner=owner)
+            if st.session_state.get("favorites_filters") != filters:
+                st.session_state.favorites_filters = filters
+                st.session_state.favorites_page = 1
+            _, total = favorites.query(**filters, limit=0)
+            pages = max(1, -(-total // FAVORITES_PAGE_SIZE))
+            st.session_state.favorites_page = min(st.session_state.favorites_page, pages)
+            if pages > 1:
+                st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="favorites_page")
+            page = st.session_state.favorites_page
+            page_favorites, _ = favorites.query(
+                **filters, limit=FAVORITES_PAGE_SIZE, offset=(page - 1) * FAVORITES_PAGE_SIZE
+            )
 
-            if filtered_favorites:
-                for idx, fav in enumerate(filtered_favorites, start=1):
+            if page_favorites:
+                st.caption(f"{total} matching favorites")
+                for idx, fav in enumerate(page_favorites, start=(page - 1) * FAVORITES_PAGE_SIZE + 1):
                     st.markdown(f"#### Favorite {idx}")
                     st.markdown(render_post_box(fav['post']), unsafe_allow_html=True)
                     st.markdown(f"**Hashtags:** {fav['hashtags']}")
                     st.markdown(f"*Image Suggestion:* _{fav['image']}_")
+                    details = [value for value in (fav['topic'], fav['tone'], fav['language']) if value]
+                    saved = time.strftime('%Y-%m-%d %H:%M', time.localtime(fav['created_at']))
+                    st.caption(" · ".join(details + [f"saved {saved}"]))
             else:
                 st.warning("No favorites matched your search or filter.")
 
@@ -294,5 +492,12 @@ Post:
         else:
             st.info("No favorites saved yet.")
 
+    stats = response_cache.stats()
+    st.sidebar.caption(f"Response cache ({stats['backend']}): {stats['hits']} hits, {stats['misses']} misses")
+    st.sidebar.caption(f"Coalesced requests: {inflight.stats()['coalesced']}")
+
+    render_admin_panel()
+    telemetry.record("rerun", time.perf_counter() - rerun_start)
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,47 @@
-from llm_helper import llm
-from few_shot import FewShotPosts
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
-# Initialize few-shot helper
-few_shot = FewShotPosts()
+from llm_helper import complete, stream_complete, count_tokens, truncate_to_tokens
+from dedup import DUPLICATE_THRESHOLD, RecentSignatures
+from few_shot import get_few_shot_posts
+from telemetry import traced
+
+LENGTH_OPTIONS = ["Short", "Medium", "Long", "Custom"]
+LANGUAGE_OPTIONS = ["English", "Tamil", "Sinhala"]
+TONE_OPTIONS = ["Professional", "Inspirational", "Conversational", "Humorous", "Motivational"]
+
+# Every function here reports failures (and rejected input) as text starting with one of these
+ERROR_PREFIXES = ("Error:", "⚠️ Warning")
+
+# Input token budget for generation prompts, including few-shot examples
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+EXAMPLE_POOL_SIZE = 20
+EXAMPLE_OVERHEAD_TOKENS = 6
+MIN_EXAMPLE_TOKENS = 40
+EXAMPLES_HEADING = "\n5) Use the tone and style similar to these examples:\n"
+
+PROMPT_RULES = """
+If Language is "Tamil", write the posts in Tamil script.
+If Language is "Sinhala", write the posts in Sinhala script.
+If Language is "English", write the posts in English.
+
+Each post must end with 2 to 4 relevant hashtags (e.g., #JobSearch, #CareerGrowth).
+Hashtags should be listed on a new line after the image idea, and must be relevant to the topic and tone.
+Each image idea should be specific, visual, and match the tone and topic of the post.
+"""
+
+# Generated posts at least this similar (estimated Jaccard) to a corpus post or an
+# earlier generation are flagged as copies
+COPY_THRESHOLD = DUPLICATE_THRESHOLD
+recent_generations = RecentSignatures(capacity=1000)
+
+# Sampling settings cycled through by fan-out generation so variations differ
+FANOUT_VARIANTS = [
+    {"angle": "a personal story", "temperature": 0.7},
+    {"angle": "practical, actionable tips", "temperature": 0.9},
+    {"angle": "a lesson learned or a bold opinion", "temperature": 1.1},
+]
 
 
 def get_length_str(length, custom_line_count=None):
@@ -26,80 +65,92 @@ def enforce_custom_limit(length, custom_line_count):
     return None
 
 
-def get_prompt(length, language, tag, tone, custom_line_count=None):
-    """Construct a prompt with clearly labeled few-shot examples and image suggestions."""
-    length_str = get_length_str(length, custom_line_count)
+@lru_cache(maxsize=None)
+def get_prompt_header(post_count=3):
+    """Static instruction header with the Post/Image Idea labels, built once per post count."""
+    if post_count == 1:
+        intro = "Generate 1 LinkedIn post based on the following criteria. Label it clearly as:"
+    else:
+        intro = f"Generate {post_count} different LinkedIn posts based on the following criteria. Label them clearly as:"
+    labels = "\n\n".join(f"Post {i}:\n<post content>\nImage Idea {i}:\n<image prompt>" for i in range(1, post_count + 1))
+    return f"\n{intro}\n\n{labels}\n\nNo preamble or explanation.\n"
 
-    prompt = f"""
-Generate 3 different LinkedIn posts based on the following criteria. Label them clearly as:
 
-Post 1:
-<post content>
-Image Idea 1:
-<image prompt>
+def select_examples(examples, budget, max_examples=3, prefer_short=False):
+    """Pick up to max_examples example texts that fit within budget tokens.
 
-Post 2:
-<post content>
-Image Idea 2:
-<image prompt>
+    Examples are taken in relevance order (or shortest first when prefer_short);
+    one that does not fit is truncated if at least MIN_EXAMPLE_TOKENS remain.
+    """
+    texts = []
+    for post in examples[:EXAMPLE_POOL_SIZE]:
+        text = post.get('text', '').strip()
+        if text and text not in texts:
+            texts.append(text)
+    if prefer_short:
+        texts.sort(key=count_tokens)
 
-Post 3:
-<post content>
-Image Idea 3:
-<image prompt>
+    selected = []
+    for text in texts:
+        cost = count_tokens(text) + EXAMPLE_OVERHEAD_TOKENS
+        if cost > budget:
+            if budget - EXAMPLE_OVERHEAD_TOKENS < MIN_EXAMPLE_TOKENS:
+                continue
+            text = truncate_to_tokens(text, budget - EXAMPLE_OVERHEAD_TOKENS)
+            cost = count_tokens(text) + EXAMPLE_OVERHEAD_TOKENS
+        selected.append(text)
+        budget -= cost
+        if len(selected) == max_examples:
+            break
+    return selected
 
-No preamble or explanation.
 
-1) Topic: {tag}
-2) Language: {language}
-3) Length: {length_str}
-4) Tone: {tone}
+@traced("prompt.build")
+def get_prompt(length, language, tag, tone, custom_line_count=None, post_count=3, angle=None,
+               token_budget=None):
+    """Construct a prompt with clearly labeled few-shot examples and image suggestions.
 
-If Language is "Tamil", write the posts in Tamil script.
-If Language is "Sinhala", write the posts in Sinhala script.
-If Language is "English", write the posts in English.
+    post_count sets how many labeled posts are requested; angle, when given, asks
+    for a specific take so fan-out variations differ from each other. Examples are
+    chosen and truncated so the whole prompt fits token_budget (PROMPT_TOKEN_BUDGET
+    by default).
+    """
+    length_str = get_length_str(length, custom_line_count)
 
-Each post must end with 2 to 4 relevant hashtags (e.g., #JobSearch, #CareerGrowth).
-Hashtags should be listed on a new line after the image idea, and must be relevant to the topic and tone.
-Each image idea should be specific, visual, and match the tone and topic of the post.
-"""
+    prompt = (
+        get_prompt_header(post_count)
+        + f"\n1) Topic: {tag}\n2) Language: {language}\n3) Length: {length_str}\n4) Tone: {tone}\n"
+        + PROMPT_RULES
+    )
+    if angle:
+        prompt += f"Approach the topic from this angle: {angle}.\n"
 
+    # Exact tag matches first (equally relevant, so shortest first); free-text topics
+    # such as bullet points fall back to semantic retrieval, already in relevance order
+    few_shot = get_few_shot_posts()
     examples = few_shot.get_filtered_posts(length, language, tag)
-    if examples:
-        prompt += "\n5) Use the tone and style similar to these examples:\n"
-        for i, post in enumerate(examples[:3]):
-            post_text = post.get('text', '').strip()
-            if post_text:
-                prompt += f"\nExample {i + 1}:\n{post_text}\n"
-
-    return prompt.strip()
-
+    prefer_short = bool(examples)
+    if not examples:
+        examples = few_shot.get_similar_posts(tag, length, language)
 
-def generate_post(length, language, tag, tone, custom_line_count=None):
-    """Generate 3 posts and image ideas using LLM and few-shot prompting."""
-    limit_check = enforce_custom_limit(length, custom_line_count)
-    if limit_check:
-        return limit_check
+    budget = (token_budget or PROMPT_TOKEN_BUDGET) - count_tokens(prompt) - count_tokens(EXAMPLES_HEADING)
+    selected = select_examples(examples, budget, prefer_short=prefer_short)
+    if selected:
+        prompt += EXAMPLES_HEADING
+        for i, post_text in enumerate(selected):
+            prompt += f"\nExample {i + 1}:\n{post_text}\n"
 
-    prompt = get_prompt(length, language, tag, tone, custom_line_count)
-
-    try:
-        response = llm.invoke(prompt)
-        return response.content.strip()
-    except Exception as e:
-        print(f"LLM failed to generate post: {e}")
-        return "Error: Could not generate post."
+    prompt = prompt.strip()
+    print(f"Prompt: {count_tokens(prompt)} tokens, {len(selected)} examples (budget {token_budget or PROMPT_TOKEN_BUDGET})")
+    return prompt
 
 
-def rewrite_post(original_text, new_length, new_language, new_tone, custom_line_count=None):
-    """Rewrite an existing LinkedIn post with new tone, language, and length."""
-    limit_check = enforce_custom_limit(new_length, custom_line_count)
-    if limit_check:
-        return limit_check
-
+@traced("prompt.build")
+def get_rewrite_prompt(original_text, new_length, new_language, new_tone, custom_line_count=None):
+    """Construct the prompt for rewriting an existing post."""
     length_str = get_length_str(new_length, custom_line_count)
 
-    prompt = f"""
+    return f"""
 Rewrite the following LinkedIn post using the specified parameters.
 
 Original Post:
@@ -120,9 +171,149 @@ Keep the message clear, authentic, and impactful. End with 2 to 4 relevant hasht
 No image suggestion needed.
 """
 
+
+@traced("prompt.build")
+def get_feedback_prompt(post_text):
+    """Construct the prompt asking for engagement tips on a post."""
+    return f"""
+Analyze the following LinkedIn post and give 3 clear and actionable tips to improve engagement. Be concise and helpful.
+
+Post:
+\"\"\"{post_text.strip()}\"\"\""""
+
+
+def generate_post(length, language, tag, tone, custom_line_count=None, use_cache=True, write_cache=True):
+    """Generate 3 posts and image ideas using LLM and few-shot prompting.
+
+    write_cache=False keeps the result out of the response cache (see complete()).
+    """
+    limit_check = enforce_custom_limit(length, custom_line_count)
+    if limit_check:
+        return limit_check
+
+    prompt = get_prompt(length, language, tag, tone, custom_line_count)
+
     try:
-        response = llm.invoke(prompt)
-        return response.content.strip()
+        return complete(prompt, use_cache=use_cache, write_cache=write_cache)
+    except Exception as e:
+        print(f"LLM failed to generate post: {e}")
+        return "Error: Could not generate post."
+
+
+def generate_post_stream(length, language, tag, tone, custom_line_count=None, use_cache=True, timings=None):
+    """Streaming variant of generate_post: yields text chunks as the model produces them."""
+    limit_check = enforce_custom_limit(length, custom_line_count)
+    if limit_check:
+        yield limit_check
+        return
+
+    prompt = get_prompt(length, language, tag, tone, custom_line_count)
+
+    try:
+        yield from stream_complete(prompt, use_cache=use_cache, timings=timings)
+    except Exception as e:
+        print(f"LLM failed to generate post: {e}")
+        yield "Error: Could not generate post."
+
+
+def generate_posts_fanout(length, language, tag, tone, custom_line_count=None, n=3, use_cache=True, reused=None):
+    """Generate n posts as n concurrent single-post requests.
+
+    Yields (variant_index, raw_output) in completion order, so callers can render
+    each post as soon as it arrives. A failed request yields an error string for
+    its own variant only. If a set is passed as reused, a variant's index is added
+    to it (before it is yielded) when its output came from the cache or a shared call.
+    """
+    limit_check = enforce_custom_limit(length, custom_line_count)
+    if limit_check:
+        yield 0, limit_check
+        return
+
+    infos = [{} for _ in range(n)]
+
+    def run(i):
+        variant = FANOUT_VARIANTS[i % len(FANOUT_VARIANTS)]
+        prompt = get_prompt(length, language, tag, tone, custom_line_count, post_count=1, angle=variant["angle"])
+        # A fixed seed makes cached variants reproducible; fresh variations must sample freely
+        seed = {"seed": i} if use_cache else {}
+        return complete(prompt, use_cache=use_cache, info=infos[i], temperature=variant["temperature"], **seed)
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        futures = {executor.submit(run, i): i for i in range(n)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"LLM failed to generate post variant {i + 1}: {e}")
+                yield i, "Error: Could not generate post."
+                continue
+            if reused is not None and (infos[i].get("cached") or infos[i].get("coalesced")):
+                reused.add(i)
+            yield i, result
+
+
+def rewrite_post(original_text, new_length, new_language, new_tone, custom_line_count=None, use_cache=True):
+    """Rewrite an existing LinkedIn post with new tone, language, and length."""
+    limit_check = enforce_custom_limit(new_length, custom_line_count)
+    if limit_check:
+        return limit_check
+
+    prompt = get_rewrite_prompt(original_text, new_length, new_language, new_tone, custom_line_count)
+
+    try:
+        return complete(prompt, use_cache=use_cache)
     except Exception as e:
         print(f"LLM failed to rewrite post: {e}")
         return "Error: Could not rewrite post."
+
+
+def rewrite_post_stream(original_text, new_length, new_language, new_tone, custom_line_count=None,
+                        use_cache=True, timings=None):
+    """Streaming variant of rewrite_post."""
+    limit_check = enforce_custom_limit(new_length, custom_line_count)
+    if limit_check:
+        yield limit_check
+        return
+
+    prompt = get_rewrite_prompt(original_text, new_length, new_language, new_tone, custom_line_count)
+
+    try:
+        yield from stream_complete(prompt, use_cache=use_cache, timings=timings)
+    except Exception as e:
+        print(f"LLM failed to rewrite post: {e}")
+        yield "Error: Could not rewrite post."
+
+
+def get_feedback(post_text, use_cache=True):
+    """Return 3 engagement tips for a post."""
+    try:
+        return complete(get_feedback_prompt(post_text), use_cache=use_cache)
+    except Exception as e:
+        print(f"LLM failed to give feedback: {e}")
+        return "Error: Could not get feedback."
+
+
+def get_feedback_stream(post_text, use_cache=True, timings=None):
+    """Streaming variant of get_feedback."""
+    try:
+        yield from stream_complete(get_feedback_prompt(post_text), use_cache=use_cache, timings=timings)
+    except Exception as e:
+        print(f"LLM failed to give feedback: {e}")
+        yield "Error: Could not get feedback."
+
+
+def check_originality(post_text, check_recent=True):
+    """Flag a generated post that copies a corpus example or an earlier generation nearly verbatim.
+
+    Returns the closest corpus post text (or None) with its similarity, and the
+    similarity to the most alike of the last 1000 generated posts. The post is
+    then remembered for later checks. Pass check_recent=False for output served
+    again from the cache or a shared call: it is an earlier generation, not a repeat of one.
+    """
+    matches = get_few_shot_posts().find_near_duplicates(post_text, COPY_THRESHOLD)
+    return {
+        "corpus_match": matches[0][0].get("text") if matches else None,
+        "corpus_similarity": matches[0][1] if matches else 0.0,
+        "recent_similarity": recent_generations.check_and_add(post_text) if check_recent else 0.0,
+    }
@@ -0,0 +1,129 @@
+import re
+
+POST_MARKER = re.compile(r"^[\s*#>_]*Post\s*(\d+)\s*:[\s*_]*(.*)$", re.IGNORECASE)
+IMAGE_MARKER = re.compile(r"^[\s*#>_]*Image\s*Idea\s*(\d+)\s*:[\s*_]*(.*)$", re.IGNORECASE)
+HASHTAG_LINE = re.compile(r"^#[^\s#]")
+TRAILING_HASHTAGS = re.compile(r"(?:^|\s)((?:#[^\s#]+\s*)+)$")
+
+
+def split_trailing_hashtags(text):
+    """Split "A sunrise #Career #Growth" into ("A sunrise", "#Career #Growth"); hashtags are "" if there are none."""
+    match = TRAILING_HASHTAGS.search(text)
+    if not match:
+        return text, ""
+    return text[:match.start()].rstrip(), " ".join(match.group(1).split())
+
+
+class PostStreamParser:
+    """Incremental parser for the "Post N: / Image Idea N: / #hashtags" output format.
+
+    feed() accepts chunks of any size and returns the posts completed by that
+    chunk as (post_content, image_idea, hashtags) tuples; close() flushes the
+    last one. Work is linear in the input: each line is classified once.
+    Sections that do not fit the format are kept and described in `issues`.
+    """
+
+    def __init__(self, max_posts=None):
+        self.max_posts = max_posts
+        self.posts = []
+        self.issues = []
+        self._buffer = ""
+        self._state = "preamble"
+        self._number = None
+        self._sections = None
+        self._trailing = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        completed = []
+        for line in lines:
+            completed.extend(self._consume(line))
+        return completed
+
+    def close(self):
+        completed = []
+        if self._buffer:
+            completed.extend(self._consume(self._buffer))
+            self._buffer = ""
+        completed.extend(self._finish_post())
+        if self._trailing:
+            self.issues.append(f"Ignored text outside any post: {' '.join(self._trailing)[:80]!r}")
+            self._trailing = []
+        return completed
+
+    def _consume(self, line):
+        completed = []
+        post_match = POST_MARKER.match(line)
+        if post_match:
+            completed.extend(self._finish_post())
+            self._number = post_match.group(1)
+            self._sections = {"post": [post_match.group(2)], "image": [], "hashtags": []}
+            self._state = "post"
+            return completed
+
+        image_match = IMAGE_MARKER.match(line) if self._state in ("post", "image") else None
+        if image_match:
+            if image_match.group(1) != self._number:
+                self.issues.append(f"Post {self._number}: image idea is numbered {image_match.group(1)}")
+            self._state = "image"
+            self._add_image_line(image_match.group(2))
+            return completed
+
+        stripped = line.strip()
+        if self._state == "image" and HASHTAG_LINE.match(stripped):
+            self._state = "hashtags"
+        elif self._state == "image":
+            self._add_image_line(line)
+            return completed
+        elif self._state == "hashtags" and stripped and not HASHTAG_LINE.match(stripped):
+            completed.extend(self._finish_post())
+            self._state = "after"
+
+        if self._state in ("post", "image", "hashtags"):
+            self._sections[self._state].append(line)
+        elif stripped:
+            self._trailing.append(stripped)
+        return completed
+
+    def _add_image_line(self, line):
+        """Hashtags at the end of an image idea line start the hashtag section."""
+        image, hashtags = split_trailing_hashtags(line)
+        self._sections["image"].append(image)
+        if hashtags:
+            self._sections["hashtags"].append(hashtags)
+            self._state = "hashtags"
+
+    def _finish_post(self):
+        if self._sections is None:
+            return []
+        if self._trailing:
+            self.issues.append(f"Ignored text outside any post: {' '.join(self._trailing)[:80]!r}")
+            self._trailing = []
+
+        post = "\n".join(self._sections["post"]).strip()
+        image = "\n".join(self._sections["image"]).strip()
+        hashtags = "\n".join(line.strip() for line in self._sections["hashtags"] if line.strip())
+        self._sections = None
+
+        missing = [name for name, value in (("content", post), ("image idea", image), ("hashtags", hashtags))
+                   if not value]
+        if missing:
+            self.issues.append(f"Post {self._number} is incomplete: missing {', '.join(missing)}")
+        if not post:
+            return []
+        if self.max_posts is not None and len(self.posts) >= self.max_posts:
+            self.issues.append(f"Post {self._number} exceeds the {self.max_posts}-post limit and was skipped")
+            return []
+
+        parsed = (post, image, hashtags)
+        self.posts.append(parsed)
+        return [parsed]
+
+
+def parse_posts(raw_output, max_posts=3):
+    """Parse a complete completion; returns (posts, issues)."""
+    parser = PostStreamParser(max_posts=max_posts)
+    parser.feed(raw_output if isinstance(raw_output, str) else str(raw_output))
+    parser.close()
+    return parser.posts, parser.issues
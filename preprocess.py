@@ -1,9 +1,20 @@
+import argparse
+import hashlib
 import json
+import os
 import re
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.exceptions import OutputParserException
-from llm_helper import llm
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from functools import lru_cache
+from llm_helper import count_tokens, shared_llm
+from corpus_store import columnar_path_for, write_columnar
+from dedup import DUPLICATE_THRESHOLD, DedupIndex, dedupe_texts
+from embeddings import EmbeddingIndex
+from few_shot import FewShotPosts, dedup_dir_for, embedding_dir_for, file_fingerprint
+from telemetry import traced
 
 
 # ✅ Remove emojis and unsupported Unicode
@@ -12,59 +23,216 @@ def clean_text(text):
 
 
 # ✅ Detect language override using Sinhala/Tamil Unicode ranges
+SINHALA_SCRIPT = re.compile(r'[\u0D80-\u0DFF]')
+TAMIL_SCRIPT = re.compile(r'[\u0B80-\u0BFF]')
+NON_BLANK_LINE = re.compile(r'^[ \t]*\S', re.MULTILINE)
+
+
 def detect_language_override(text):
-    if re.search(r'[\u0D80-\u0DFF]', text):  # Sinhala script
+    if SINHALA_SCRIPT.search(text):
         return "Sinhala"
-    elif re.search(r'[\u0B80-\u0BFF]', text):  # Tamil script
+    elif TAMIL_SCRIPT.search(text):
         return "Tamil"
     return "English"
 
 
-# ✅ Extract metadata using LLM with override
-def extract_metadata(post):
-    template = '''
-    You are given a LinkedIn post. You need to extract:
-    - number of lines
-    - language (English, Tamil, or Sinhala)
-    - tags (max 2 relevant topics)
+# ✅ Line count and language are deterministic, so they never go to the LLM
+def count_lines(text):
+    return max(1, len(NON_BLANK_LINE.findall(text)))
 
-    Definitions:
-    - Tamil = post is written using Tamil script
-    - Sinhala = post is written using Sinhala script
 
-    Return a valid JSON with exactly these three keys: line_count, language, tags.
-    No preamble.
+def local_metadata(text):
+    return {'line_count': count_lines(text), 'language': detect_language_override(text)}
+
+
+# ✅ langchain_core takes about half a second to import, so it loads on the first LLM call;
+# a --resume run with nothing new never pays for it
+@lru_cache(maxsize=None)
+def prompt_template(template):
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate.from_template(template)
+
+
+CIRCUIT_WAITS = 3
+
+
+def invoke_template(template, inputs, rate_limiter=None, retries=0, circuit_waits=CIRCUIT_WAITS):
+    """Fill a prompt template and send it through the shared gateway.
+
+    The gateway is the only layer that retries: retries and rate_limiter apply to
+    every upstream attempt, failovers included. When every circuit is open, the
+    call waits for one to let a trial through (up to circuit_waits times) instead
+    of aborting the run.
+    """
+    from llm_gateway import AllModelsUnavailable
+    gateway = shared_llm().with_limits(retries=retries, rate_limiter=rate_limiter)
+    chain = prompt_template(template) | gateway
+    for attempt in range(circuit_waits + 1):
+        try:
+            return chain.invoke(input=inputs)
+        except AllModelsUnavailable:
+            if attempt == circuit_waits:
+                raise
+            wait = max(gateway.retry_after(), gateway.base_delay)
+            print(f"All LLM circuits open; waiting {wait:.1f}s")
+            time.sleep(wait)
 
-    Post:
-    {post}
-    '''
-    pt = PromptTemplate.from_template(template)
-    chain = pt | llm
-    response = chain.invoke(input={'post': post})
 
+def parse_json(content):
+    """Parse a JSON answer (code fences are fine); None if it is not valid JSON."""
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.exceptions import OutputParserException
     try:
-        json_parser = JsonOutputParser()
-        res = json_parser.parse(response.content)
-        # ✅ Override LLM's guess with regex detection if needed
-        res['language'] = detect_language_override(post)
+        return JsonOutputParser().parse(content)
     except OutputParserException:
-        raise OutputParserException("Context too big. Unable to parse jobs.")
-    return res
+        return None
 
 
-# ✅ Create a unified set of tags using LLM
-def get_unified_tags(posts_with_metadata):
-    unique_tags = set()
-    for post in posts_with_metadata:
-        unique_tags.update(post['tags'])
+# ✅ Only tags need the LLM; many posts are packed into one prompt
+TAGS_TEMPLATE = '''
+    You are given a JSON array of LinkedIn posts, each with an "id" and a "post".
+    For every post, pick at most 2 relevant topic tags.
+
+    Return a valid JSON array with one object per post, each with exactly these
+    keys: "id" (copied unchanged) and "tags" (a list of strings).
+    No preamble.
+
+    Posts:
+    {posts}
+    '''
+TAG_BATCH_SIZE = 25
+TAG_BATCH_TOKENS = 3000
+
+
+def pack_tag_batches(items, max_posts=TAG_BATCH_SIZE, max_tokens=TAG_BATCH_TOKENS):
+    """Greedily pack (id, text) pairs into batches under a post count and token budget.
+
+    A post longer than the budget gets a batch of its own.
+    """
+    batches, batch, used = [], [], 0
+    for item in items:
+        tokens = count_tokens(item[1])
+        if batch and (len(batch) >= max_posts or used + tokens > max_tokens):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(item)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_tag_response(content, ids):
+    """Map each requested id to its tag list; ids that are missing or malformed are left out."""
+    res = parse_json(content)
+    if isinstance(res, dict):
+        res = [{'id': key, 'tags': value} for key, value in res.items()]
+    if not isinstance(res, list):
+        return {}
+
+    wanted = {str(post_id): post_id for post_id in ids}
+    tags_by_id = {}
+    for item in res:
+        if not isinstance(item, dict) or str(item.get('id')) not in wanted:
+            continue
+        tags = item.get('tags')
+        if isinstance(tags, str):
+            tags = [tags]
+        if isinstance(tags, list):
+            tags_by_id[wanted[str(item['id'])]] = [str(tag).strip() for tag in tags if str(tag).strip()][:2]
+    return tags_by_id
 
-    unique_tags_list = ', '.join(unique_tags)
 
-    template = '''You are given a list of tags. Your task is to unify and standardize them:
+@traced("preprocess.extract_tags")
+def extract_tags_batch(batch, rate_limiter=None, retries=0):
+    """Tag a batch of (id, text) pairs in one LLM call.
+
+    Posts the answer leaves out (or mangles) are retried one at a time; a post
+    that still cannot be parsed maps to None rather than failing the run.
+    """
+    payload = json.dumps([{'id': post_id, 'post': text} for post_id, text in batch], ensure_ascii=False)
+    response = invoke_template(TAGS_TEMPLATE, {'posts': payload}, rate_limiter=rate_limiter, retries=retries)
+    tags_by_id = parse_tag_response(response.content, [post_id for post_id, _ in batch])
+
+    missing = [item for item in batch if item[0] not in tags_by_id]
+    if missing and len(batch) > 1:
+        for item in missing:
+            tags_by_id.update(extract_tags_batch([item], rate_limiter=rate_limiter, retries=retries))
+    elif missing:
+        print(f"Could not parse tags for post {missing[0][0]}; leaving it untagged.")
+        tags_by_id[missing[0][0]] = None
+    return tags_by_id
+
+
+def extract_metadata(post, rate_limiter=None, retries=0):
+    """Metadata for a single post: local line count and language, LLM tags."""
+    tags = extract_tags_batch([(0, post)], rate_limiter=rate_limiter, retries=retries)[0]
+    return local_metadata(post) | {'tags': tags or []}
+
+
+# ✅ Cheap local tag normalization (no network calls)
+# Split before a capitalized word, but never inside an acronym ("IoT", "AIEthics" -> "AI Ethics")
+CAMEL_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z][a-z])|(?<=[A-Z])(?=[A-Z][a-z])')
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def singularize(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_tag(tag):
+    """Case-fold, split CamelCase/#hashtags and singularize, e.g. "#JobSearches" -> "job search"."""
+    words = NON_WORD.sub(' ', CAMEL_BOUNDARY.sub(' ', tag)).casefold().split()
+    return ' '.join(singularize(word) for word in words)
+
+
+def cluster_tags(tags, similarity=0.9):
+    """Group tags by normalized form, then merge near-identical forms (typos, spacing).
+
+    Candidates are only compared within a block sharing the same first three
+    letters, so the pairwise check stays small.
+    Returns {normalized key: [original tags]}.
+    """
+    clusters = {}
+    for tag in tags:
+        clusters.setdefault(normalize_tag(tag), []).append(tag)
+
+    blocks = {}
+    for key in sorted(clusters, key=len, reverse=True):
+        blocks.setdefault(key.replace(' ', '')[:3], []).append(key)
+
+    for keys in blocks.values():
+        for i, key in enumerate(keys):
+            for other in keys[:i]:
+                if other in clusters and SequenceMatcher(None, key, other).ratio() >= similarity:
+                    clusters[other].extend(clusters.pop(key))
+                    break
+    return clusters
+
+
+def canonical_tag(variants, counts=None):
+    """Most frequent spelling of a cluster; only all-lowercase words are capitalized ("AI", "LinkedIn" stay).
+
+    counts maps each spelling to how many posts use it; ties go to the spelling seen first.
+    """
+    counts = counts or Counter(variants)
+    spelling = max(dict.fromkeys(variants), key=lambda tag: counts[tag]).strip('# ')
+    return ' '.join(word.capitalize() if word.islower() else word for word in spelling.split(' '))
+
+
+# ✅ Create a unified set of tags using LLM
+UNIFY_TEMPLATE = '''You are given a list of tags. Your task is to unify and standardize them:
 
     1. Merge similar or related tags into general tags.
-    2. Use Title Case.
-    3. Return valid JSON with original tag → unified tag. No explanation.
+    2. Prefer one of the existing unified tags when it fits.
+    3. Use Title Case.
+    4. Return valid JSON with original tag → unified tag. No explanation.
 
     Example:
     {{
@@ -72,44 +240,222 @@ def get_unified_tags(posts_with_metadata):
       "Motivation": "Motivation"
     }}
 
+    Existing unified tags:
+    {known}
+
     Tags:
     {tags}
     '''
-    pt = PromptTemplate.from_template(template)
-    chain = pt | llm
-    response = chain.invoke(input={"tags": str(unique_tags_list)})
 
-    try:
-        json_parser = JsonOutputParser()
-        res = json_parser.parse(response.content)
-    except OutputParserException:
-        raise OutputParserException("Context too big. Unable to parse tags.")
-    return res
+
+def load_tag_mapping(path):
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_tag_mapping(path, mapping):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(mapping, f, indent=4, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@traced("preprocess.unify_tags")
+def unify_tag_batch(batch, known, rate_limiter=None, retries=0):
+    """Ask the LLM to map one small batch of canonical tags; unparseable answers map tags to themselves."""
+    response = invoke_template(UNIFY_TEMPLATE, {"tags": ', '.join(batch), "known": ', '.join(known) or "(none)"},
+                               rate_limiter=rate_limiter, retries=retries)
+    res = parse_json(response.content)
+    if res is None:
+        print(f"Could not parse unified tags for batch: {batch}")
+    if not isinstance(res, dict):
+        res = {}
+    return {tag: str(res.get(tag) or tag).strip() for tag in batch}
+
+
+def get_unified_tags(posts_with_metadata, mapping_path=None, batch_size=50, concurrency=4,
+                     rate_limiter=None, retries=0, max_known=200):
+    """Return {original tag: unified tag} for every tag in the posts.
+
+    Tags are clustered locally first; only clusters whose canonical form is not
+    already in the persisted mapping (at mapping_path) go to the LLM, in small
+    batches processed concurrently. The merged mapping is written back so known
+    tags never reach the LLM again.
+    """
+    tag_counts = Counter(tag for post in posts_with_metadata for tag in post['tags'])
+
+    mapping = load_tag_mapping(mapping_path)
+    known_by_key = {normalize_tag(tag): unified for tag, unified in mapping.items()}
+
+    clusters = cluster_tags(tag_counts)
+    # Clusters that stayed apart can still share a canonical spelling ("IoT", "IOT"); ask once for both
+    pending_keys = {}
+    for key, variants in clusters.items():
+        if key not in known_by_key:
+            pending_keys.setdefault(canonical_tag(variants, tag_counts), []).append(key)
+    pending = sorted(pending_keys)
+
+    if pending:
+        known = [tag for tag, _ in Counter(mapping.values()).most_common(max_known)]
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            results = executor.map(
+                lambda batch: unify_tag_batch(batch, known, rate_limiter=rate_limiter, retries=retries), batches
+            )
+            for result in results:
+                for tag, unified in result.items():
+                    for key in pending_keys[tag]:
+                        known_by_key[key] = unified
+                    mapping[tag] = unified
+
+    unified_tags = {}
+    for key, variants in clusters.items():
+        for tag in variants:
+            unified_tags[tag] = known_by_key[key]
+            mapping.setdefault(tag, known_by_key[key])
+
+    if mapping_path:
+        save_tag_mapping(mapping_path, mapping)
+    return unified_tags
+
+
+# ✅ Append-only checkpoint of extracted metadata, keyed by content hash
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """JSONL file with one {"hash", "metadata"} record per processed post.
+
+    Records are appended and flushed as soon as they are produced, so a crash
+    loses at most the post in flight. A torn final line is ignored on load.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self.truncate_torn_line(path)
+            self.entries = self.load(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def truncate_torn_line(path):
+        """Drop a partially written last record so new appends start on a fresh line."""
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    @staticmethod
+    def load(path):
+        entries = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[record['hash']] = record['metadata']
+        return entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, metadata):
+        with self._lock:
+            self.entries[key] = metadata
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'hash': key, 'metadata': metadata}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
 
 
 # ✅ Main processing function
-def process_posts(raw_file_path, processed_file_path="data/processed_posts.json"):
-    enriched_posts = []
+@traced("preprocess.process_posts")
+def process_posts(raw_file_path, processed_file_path="data/processed_posts.json",
+                  concurrency=1, requests_per_second=None, retries=5,
+                  checkpoint_path=None, resume=False, tag_mapping_path=None,
+                  dedupe_threshold=DUPLICATE_THRESHOLD):
+    """Enrich raw posts with metadata and unified tags.
+
+    Line count and language are computed locally; tags are requested for many
+    posts per LLM call. With concurrency > 1, those calls run on a bounded
+    thread pool; results keep the input order. requests_per_second throttles LLM calls with a token
+    bucket, and retryable errors (429, 5xx, timeouts) back off exponentially.
+
+    With a checkpoint_path, each post's metadata is appended to a JSONL store as
+    soon as its batch is tagged. resume=True reuses that store, so only new or
+    changed posts (by hash of the cleaned text) are sent to the LLM.
+
+    tag_mapping_path persists the original -> unified tag mapping across runs.
+
+    Near-duplicates (reposts, lightly edited copies) are dropped before any LLM
+    call: of every group whose estimated Jaccard similarity reaches
+    dedupe_threshold, only the first post is kept. None disables this.
+    """
+    rate_limiter = None
+    if requests_per_second:
+        from llm_gateway import TokenBucket
+        rate_limiter = TokenBucket(requests_per_second)
+    checkpoint = CheckpointStore(checkpoint_path, resume=resume) if checkpoint_path else None
+    start = time.perf_counter()
 
     with open(raw_file_path, encoding='utf-8') as file:
         posts = json.load(file)
 
-        for post in posts:
-            post['text'] = clean_text(post['text'])
-            metadata = extract_metadata(post['text'])
+    for post in posts:
+        post['text'] = clean_text(post['text'])
+
+    # ✅ Drop reposts and near-identical variants before spending LLM calls on them
+    if dedupe_threshold is not None:
+        keep = dedupe_texts([post['text'] for post in posts], threshold=dedupe_threshold)
+        print(f"Dropped {len(posts) - len(keep)} near-duplicate posts (threshold {dedupe_threshold})")
+        posts = [posts[i] for i in keep]
 
-            # ✅ Debug prints
-            print("Detected language:", metadata["language"])
-            print("Extracted tags:", metadata["tags"])
-            print("Line count:", metadata["line_count"])
-            print("Post:", post["text"])
-            print("=" * 50)
+    # ✅ Reuse checkpointed metadata; everything else is measured locally and
+    # only its tags are requested, many posts per prompt
+    keys = [content_hash(post['text']) for post in posts]
+    all_metadata = [checkpoint.get(key) if checkpoint else None for key in keys]
+    pending = [i for i, metadata in enumerate(all_metadata) if metadata is None]
+    batches = pack_tag_batches([(i, posts[i]['text']) for i in pending])
 
-            post_with_metadata = post | metadata
-            enriched_posts.append(post_with_metadata)
+    def tag_batch(batch):
+        tags_by_id = extract_tags_batch(batch, rate_limiter=rate_limiter, retries=retries)
+        for i, text in batch:
+            tags = tags_by_id.get(i)
+            all_metadata[i] = local_metadata(text) | {'tags': tags or []}
+            # Untagged because the answer could not be parsed: leave it out so --resume retries it
+            if checkpoint is not None and tags is not None:
+                checkpoint.add(keys[i], all_metadata[i])
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        list(executor.map(tag_batch, batches))
+
+    enriched_posts = []
+    for post, metadata in zip(posts, all_metadata):
+        # ✅ Debug prints
+        print("Detected language:", metadata["language"])
+        print("Extracted tags:", metadata["tags"])
+        print("Line count:", metadata["line_count"])
+        print("Post:", post["text"])
+        print("=" * 50)
+
+        post_with_metadata = post | metadata
+        enriched_posts.append(post_with_metadata)
+
+    elapsed = time.perf_counter() - start
+    print(f"Extracted metadata for {len(posts)} posts in {elapsed:.2f}s "
+          f"({len(posts) / elapsed if elapsed else 0:.1f} posts/s, {len(batches)} tag requests "
+          f"for {len(pending)} new posts, concurrency={concurrency})")
 
     # ✅ Standardize tags
-    unified_tags = get_unified_tags(enriched_posts)
+    unified_tags = get_unified_tags(enriched_posts, mapping_path=tag_mapping_path, concurrency=concurrency,
+                                    rate_limiter=rate_limiter, retries=retries)
 
     for post in enriched_posts:
         current_tags = post['tags']
@@ -120,6 +466,41 @@ def process_posts(raw_file_path, processed_file_path="data/processed_posts.json"
     with open(processed_file_path, encoding='utf-8', mode="w") as outfile:
         json.dump(enriched_posts, outfile, indent=4)
 
+    # ✅ Columnar copy for fast, memory-mapped loading
+    write_columnar(enriched_posts, columnar_path_for(processed_file_path), FewShotPosts.categorize_length)
+
+    # ✅ Both indexes record the output file's hash, so loading them never re-reads the corpus to check staleness
+    _, digest = file_fingerprint(processed_file_path)
+    texts = [post['text'] for post in enriched_posts]
+
+    # ✅ Embed every post once for semantic few-shot retrieval
+    group_keys = [(post['language'], FewShotPosts.categorize_length(post['line_count'])) for post in enriched_posts]
+    EmbeddingIndex.build(texts, group_keys, digest=digest).save(embedding_dir_for(processed_file_path))
+
+    # ✅ MinHash index so generated posts can be checked for copied examples
+    DedupIndex.build(texts, digest).save(dedup_dir_for(processed_file_path))
+
 
 if __name__ == '__main__':
-    process_posts("data/raw_posts.json", "data/processed_posts.json")
+    parser = argparse.ArgumentParser(description="Extract metadata and unify tags for raw LinkedIn posts.")
+    parser.add_argument("raw_file", nargs="?", default="data/raw_posts.json")
+    parser.add_argument("processed_file", nargs="?", default="data/processed_posts.json")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel LLM requests (default: 1)")
+    parser.add_argument("--rps", type=float, default=None, help="Max LLM requests per second")
+    parser.add_argument("--retries", type=int, default=5, help="Retries for rate limits and transient errors")
+    parser.add_argument("--checkpoint", default="data/metadata_checkpoint.jsonl",
+                        help="Append-only JSONL store of extracted metadata")
+    parser.add_argument("--resume", "--incremental", action="store_true", dest="resume",
+                        help="Reuse the checkpoint and only process new or changed posts")
+    parser.add_argument("--tag-mapping", default="data/tag_mapping.json",
+                        help="Persisted original -> unified tag mapping reused across runs")
+    parser.add_argument("--dedupe-threshold", type=float, default=DUPLICATE_THRESHOLD,
+                        help="Similarity at which posts count as near-duplicates")
+    parser.add_argument("--no-dedupe", action="store_const", const=None, dest="dedupe_threshold",
+                        help="Keep near-duplicate posts")
+    args = parser.parse_args()
+
+    process_posts(args.raw_file, args.processed_file, concurrency=args.concurrency,
+                  requests_per_second=args.rps, retries=args.retries,
+                  checkpoint_path=args.checkpoint, resume=args.resume, tag_mapping_path=args.tag_mapping,
+                  dedupe_threshold=args.dedupe_threshold)
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+from few_shot import get_few_shot_posts
+from post_generator import ERROR_PREFIXES, LANGUAGE_OPTIONS, LENGTH_OPTIONS, TONE_OPTIONS, generate_post
+from telemetry import increment, span
+
+PREWARM_CALLS_PER_HOUR = int(os.getenv("PREWARM_CALLS_PER_HOUR", "0"))
+PREWARM_POOL_SIZE = int(os.getenv("PREWARM_POOL_SIZE", "2"))
+PREWARM_HOT_COMBOS = int(os.getenv("PREWARM_HOT_COMBOS", "5"))
+PREWARM_MIN_REQUESTS = int(os.getenv("PREWARM_MIN_REQUESTS", "2"))
+PREWARM_IDLE_SECONDS = float(os.getenv("PREWARM_IDLE_SECONDS", "5"))
+PREWARM_MAX_AGE = float(os.getenv("PREWARM_MAX_AGE", "3600"))
+PREWARM_HALF_LIFE = float(os.getenv("PREWARM_HALF_LIFE", "3600"))
+
+
+class CallBudget:
+    """At most `per_hour` calls in any sliding hour."""
+
+    def __init__(self, per_hour, window=3600.0):
+        self.per_hour = per_hour
+        self.window = window
+        self.spent = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self.spent and now - self.spent[0] >= self.window:
+            self.spent.popleft()
+
+    def try_spend(self):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self.spent) >= self.per_hour:
+                return False
+            self.spent.append(now)
+            return True
+
+    def remaining(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(0, self.per_hour - len(self.spent))
+
+
+def is_prewarmable(length, language, tag, tone, custom_line_count=None):
+    """Only the fixed option space is pooled: no custom lengths, and only topics from the corpus."""
+    return (
+        length in LENGTH_OPTIONS and length != "Custom" and custom_line_count is None
+        and language in LANGUAGE_OPTIONS and tone in TONE_OPTIONS
+        and tag in get_few_shot_posts().get_tags()
+    )
+
+
+class Prewarmer:
+    """Pools fresh generate_post results for the most requested selections.
+
+    take() counts every request and hands out a pooled result at most once. A
+    background thread refills the pools of the hottest selections, but only
+    after idle_seconds without requests and within the hourly call budget.
+    Request counts halve every half_life seconds, so popularity follows recent
+    traffic; pooled results older than max_age are thrown away.
+    """
+
+    def __init__(self, generate=generate_post, calls_per_hour=PREWARM_CALLS_PER_HOUR,
+                 pool_size=PREWARM_POOL_SIZE, hot_combos=PREWARM_HOT_COMBOS, min_requests=PREWARM_MIN_REQUESTS,
+                 idle_seconds=PREWARM_IDLE_SECONDS, max_age=PREWARM_MAX_AGE, half_life=PREWARM_HALF_LIFE,
+                 is_valid=is_prewarmable):
+        self.generate = generate
+        self.budget = CallBudget(calls_per_hour)
+        self.pool_size = pool_size
+        self.hot_combos = hot_combos
+        self.min_requests = min_requests
+        self.idle_seconds = idle_seconds
+        self.max_age = max_age
+        self.half_life = half_life
+        self.is_valid = is_valid
+        self.counts = Counter()
+        self.pools = {}
+        self.stats = Counter()
+        self.last_request = 0.0
+        self.last_decay = time.monotonic()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.budget.per_hour > 0 and self.pool_size > 0
+
+    def take(self, length, language, tag, tone, custom_line_count=None):
+        """Record a request; return a pooled result for it (used up) or None."""
+        if not self.enabled or not self.is_valid(length, language, tag, tone, custom_line_count):
+            return None
+        combo = (length, language, tag, tone)
+        now = time.monotonic()
+        with self._lock:
+            self.counts[combo] += 1
+            self.last_request = now
+            pool = self.pools.get(combo)
+            while pool and now - pool[0][0] > self.max_age:
+                pool.popleft()
+                self.stats["expired"] += 1
+            result = pool.popleft()[1] if pool else None
+            self.stats["hits" if result is not None else "misses"] += 1
+        increment("prewarm_pool_hits_total" if result is not None else "prewarm_pool_misses_total")
+        self._wake.set()
+        return result
+
+    def hottest_unfilled(self):
+        """The most requested selection whose pool is below pool_size, or None."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_decay >= self.half_life:
+                for combo in list(self.counts):
+                    self.counts[combo] /= 2
+                    if self.counts[combo] < 0.5:
+                        del self.counts[combo]
+                self.last_decay = now
+            for combo, count in self.counts.most_common(self.hot_combos):
+                if count < self.min_requests:
+                    break
+                pool = self.pools.setdefault(combo, deque())
+                while pool and now - pool[0][0] > self.max_age:
+                    pool.popleft()
+                    self.stats["expired"] += 1
+                if len(pool) < self.pool_size:
+                    return combo
+        return None
+
+    def refill_once(self):
+        """Generate one result for the hottest unfilled selection; False if there was nothing to do."""
+        combo = self.hottest_unfilled()
+        if combo is None or not self.budget.try_spend():
+            return False
+        with span("prewarm.generate"):
+            # Pooled results are served once, by take(); caching them would serve them again
+            result = self.generate(*combo, use_cache=False, write_cache=False)
+        increment("prewarm_llm_calls_total")
+        failed = result.startswith(ERROR_PREFIXES)
+        with self._lock:
+            self.stats["llm_calls"] += 1
+            self.stats["failed"] += failed
+            if not failed:
+                self.pools.setdefault(combo, deque()).append((time.monotonic(), result))
+        return True
+
+    def run(self):
+        while not self._stop.is_set():
+            idle_for = time.monotonic() - self.last_request
+            if idle_for < self.idle_seconds:
+                self._stop.wait(self.idle_seconds - idle_for)
+                continue
+            self._wake.clear()
+            try:
+                worked = self.refill_once()
+            except Exception as e:
+                print(f"Prewarm failed: {e}")
+                worked = False
+            if not worked:
+                # Nothing hot, pools full or budget spent: sleep until the next request (or a minute)
+                self._wake.wait(60)
+
+    def start(self):
+        """Start the background refill thread once; does nothing while the budget is 0."""
+        with self._lock:
+            if self._thread is None and self.enabled:
+                self._thread = threading.Thread(target=self.run, name="prewarm", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def status(self):
+        """Pool hit rate, pool sizes per selection and the remaining hourly budget."""
+        with self._lock:
+            served = self.stats["hits"] + self.stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "hit_rate": round(self.stats["hits"] / served, 3) if served else None,
+                **{key: self.stats[key] for key in ("hits", "misses", "expired", "llm_calls", "failed")},
+                "budget_remaining": self.budget.remaining(),
+                "pools": {" / ".join(combo): len(pool) for combo, pool in self.pools.items() if pool},
+            }
+
+
+@lru_cache(maxsize=None)
+def get_prewarmer():
+    """Return the process-wide prewarmer, with its refill thread started when a budget is set."""
+    return Prewarmer().start()
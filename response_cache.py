@@ -0,0 +1,226 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(prompt, model_name, params=None):
+    """Hash the rendered prompt together with the model (and sampling params) that will answer it."""
+    if params:
+        model_name = f"{model_name}\0{json.dumps(params, sort_keys=True)}"
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU cache with a size cap and a per-entry TTL (seconds)."""
+
+    def __init__(self, max_size=512, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"backend": "memory", "hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class SQLiteCache:
+    """Persistent cache on local disk; expired rows are ignored and pruned on write."""
+
+    def __init__(self, path="data/response_cache.sqlite3", ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires >= ?", (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires, value) VALUES (?, ?, ?)", (key, now + self.ttl, value)
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"backend": "sqlite", "hits": self.hits, "misses": self.misses, "size": size}
+
+
+class NullCache:
+    """Backend used when caching is switched off."""
+
+    hits = 0
+    misses = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "off", "hits": 0, "misses": 0, "size": 0}
+
+
+def create_cache(backend="memory", max_size=512, ttl=3600, path="data/response_cache.sqlite3"):
+    """Build a cache backend by name: "memory", "sqlite" or "off"."""
+    if backend == "memory":
+        return MemoryCache(max_size=max_size, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteCache(path=path, ttl=ttl)
+    if backend == "off":
+        return NullCache()
+    raise ValueError(f"Unknown response cache backend: {backend}")
+
+
+class _Flight:
+    def __init__(self):
+        self.parts = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key.
+
+    The first caller for a key (the leader) runs the upstream call; callers
+    arriving while it is in flight wait for it and receive the same result or
+    exception. Nothing is kept once the call finishes - that is the cache's job.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.leaders += 1
+            return flight, True
+
+    def _finish(self, key, flight, error=None):
+        with self._lock:
+            del self._flights[key]
+        with flight.cond:
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+
+    def do(self, key, fn):
+        """Return fn(), sharing one call among concurrent callers with the same key."""
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                flight.result = fn()
+            except Exception as e:
+                self._finish(key, flight, e)
+                raise
+            self._finish(key, flight)
+            return flight.result
+
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        if flight.result is None:
+            return "".join(flight.parts)
+        return flight.result
+
+    def stream(self, key, chunks_fn):
+        """Yield chunks from chunks_fn(), replaying them live to concurrent callers with the same key."""
+        flight, leader = self._join(key)
+        if leader:
+            error = RuntimeError("Shared stream was abandoned before it finished")
+            try:
+                for chunk in chunks_fn():
+                    with flight.cond:
+                        flight.parts.append(chunk)
+                        flight.cond.notify_all()
+                    yield chunk
+                error = None
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(key, flight, error)
+            return
+
+        seen = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: len(flight.parts) > seen or flight.done)
+                new, done = flight.parts[seen:], flight.done
+            seen += len(new)
+            yield from new
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+                if flight.result is not None:
+                    # The leader was a non-streaming call: replay its result in one piece.
+                    yield flight.result
+                return
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._flights)}
@@ -0,0 +1,129 @@
+"""Local stand-in for the Groq chat completions API, for exercising the LLM gateway.
+
+    python stub_llm_server.py --port 8765 --latency 0.5 --error-rate 0.2 --rate-limit-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=stub streamlit run main.py
+
+Per-model behaviour can be set with repeated --fail-model NAME (always 503).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+GENERATE_REQUEST = re.compile(r"Generate (\d+) (?:different )?LinkedIn posts?")
+
+
+def completion_text(messages):
+    """Labelled posts for generation prompts, one short sentence for anything else."""
+    prompt = messages[-1]["content"] if messages else ""
+    match = GENERATE_REQUEST.search(prompt)
+    if match:
+        body = " ".join(["Small steps every day add up to a career you are proud of."] * 4)
+        return "\n\n".join(f"Post {n}:\n{body}\nImage Idea {n}:\nA desk at sunrise\n#Career #Growth"
+                            for n in range(1, int(match.group(1)) + 1))
+    return f"Stub reply to a {len(prompt.split())}-word prompt."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this, Nagle plus delayed
+    # ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        config = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "")
+        with self.server.lock:
+            self.server.requests[model] = self.server.requests.get(model, 0) + 1
+            roll = self.server.rng.random()
+
+        if not self.path.endswith("/chat/completions"):
+            return self.send_json(404, {"error": {"message": "not found"}})
+        time.sleep(config["latency"])
+        if model in config["fail_models"] or roll < config["error_rate"]:
+            return self.send_json(503, {"error": {"message": "stub server error", "type": "internal_server_error"}})
+        if roll < config["error_rate"] + config["rate_limit_rate"]:
+            return self.send_json(429, {"error": {"message": "stub rate limit", "type": "rate_limit_exceeded"}},
+                                  {"Retry-After": "0"})
+
+        text = completion_text(body.get("messages", []))
+        created = int(time.time())
+        if not body.get("stream"):
+            return self.send_json(200, {
+                "id": "stub", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                             "finish_reason": "stop" if i == len(words) - 1 else None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(config["token_delay"])
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub_server(port=0, latency=0.0, token_delay=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                      fail_models=(), seed=0):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    server.config = {"latency": latency, "token_delay": token_delay, "error_rate": error_rate,
+                     "rate_limit_rate": rate_limit_rate, "fail_models": set(fail_models)}
+    server.requests = {}
+    server.lock = threading.Lock()
+    server.rng = random.Random(seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub of the Groq chat completions API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each response starts")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--fail-model", action="append", default=[], help="Model name that always gets 503")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.token_delay, args.error_rate,
+                                    args.rate_limit_rate, args.fail_model)
+    print(f"Stub LLM server on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.getenv("TRACE_FILE") or None
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+RESERVOIR_SIZE = 2048
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class StageStats:
+    """Duration histogram and recent-sample reservoir for one span name."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds, error):
+        self.count += 1
+        self.errors += bool(error)
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Telemetry:
+    """Process-wide span timings, counters and an optional JSON-lines trace."""
+
+    def __init__(self, trace_file=None):
+        self.stages = defaultdict(StageStats)
+        self.counters = defaultdict(float)
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error=None, trace=None):
+        with self._lock:
+            self.stages[name].observe(seconds, error)
+            if trace is not None and self.trace_file:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace, ensure_ascii=False, default=str) + "\n")
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def percentiles(self):
+        """Per-stage count, error count and p50/p95/p99 in milliseconds, over recent samples."""
+        with self._lock:
+            snapshot = {name: (stats.count, stats.errors, sorted(stats.recent)) for name, stats in self.stages.items()}
+        rows = []
+        for name, (count, errors, samples) in sorted(snapshot.items()):
+            def pick(q):
+                return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2) if samples else None
+            rows.append({"stage": name, "count": count, "errors": errors,
+                         "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)})
+        return rows
+
+    def prometheus(self):
+        """Render everything in the Prometheus text exposition format."""
+        lines = ["# TYPE stage_duration_seconds histogram"]
+        with self._lock:
+            for name, stats in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'stage_duration_seconds_sum{{stage="{name}"}} {stats.total:.6f}')
+                lines.append(f'stage_duration_seconds_count{{stage="{name}"}} {stats.count}')
+            lines.append("# TYPE stage_errors_total counter")
+            for name, stats in sorted(self.stages.items()):
+                lines.append(f'stage_errors_total{{stage="{name}"}} {stats.errors}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                # Counters are floats; :g would print large totals as 1.23457e+06
+                lines.append(f"{name} {int(value) if value.is_integer() else repr(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+
+telemetry = Telemetry(TRACE_FILE)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a named stage. Yields a dict the block can add attributes to.
+
+    Exceptions are counted as errors and re-raised. Spans nest, so the trace file
+    links each one to its parent.
+    """
+    parent = _current_span.get()
+    span_id = uuid.uuid4().hex[:16]
+    trace_id = parent["trace_id"] if parent else uuid.uuid4().hex
+    token = _current_span.set({"trace_id": trace_id, "span_id": span_id})
+    error = None
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except GeneratorExit:
+        attrs["abandoned"] = True
+        raise
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A span inside a generator can finish in a different context than it started in.
+            _current_span.set(parent)
+        trace = None
+        if telemetry.trace_file:
+            trace = {"trace_id": trace_id, "span_id": span_id, "parent_id": parent and parent["span_id"],
+                     "name": name, "start": start_wall, "duration_ms": round(duration * 1000, 3),
+                     "attributes": attrs, "error": error}
+        telemetry.record(name, duration, error, trace)
+
+
+def traced(name):
+    """Decorator form of span() for plain functions."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def increment(name, value=1):
+    telemetry.increment(name, value)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = telemetry.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics on a background thread, once per process. A port of 0 disables it."""
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is not None or not port:
+            return _metrics_server
+        try:
+            _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:
+            print(f"Metrics server not started on port {port}: {e}")
+            return None
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        print(f"Prometheus metrics on http://0.0.0.0:{port}/metrics")
+        return _metrics_server
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def client(fake_llm):
+    """The API with a model that always answers 503."""
+    fake_llm(error_rate=1.0)
+    return TestClient(api.app)
+
+
+def sse_events(body):
+    return [(block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+            for block in body.strip().split("\n\n")]
+
+
+def test_feedback_failure_is_a_502(client):
+    response = client.post("/feedback", json={"text": "I just finished my first marathon."})
+    assert response.status_code == 502
+    assert response.json()["error"].startswith("Error:")
+    assert api.admission.in_flight == 0
+
+
+def test_feedback_stream_failure_is_an_error_event(client):
+    response = client.post("/feedback?stream=1", json={"text": "I just finished my first marathon."})
+    assert response.status_code == 200
+    event, data = sse_events(response.text)[-1]
+    assert event == "error" and data["error"].startswith("Error:")
+    assert api.admission.in_flight == 0
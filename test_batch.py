@@ -0,0 +1,52 @@
+import json
+
+import batch
+
+
+def test_bad_jobs_get_error_records_and_the_rest_still_run(tmp_path, monkeypatch, fake_llm):
+    fake_llm()
+    jobs = [
+        {"id": "ok", "type": "rewrite", "text": "My first week at a new job", "length": "Short",
+         "language": "English", "tone": "Professional"},
+        {"id": "no-tag", "length": "Short", "language": "English", "tone": "Professional"},
+        {"id": "odd-type", "type": "translate"},
+        {"id": "raises", "type": "rewrite", "text": "Boom", "length": "Short", "language": "English",
+         "tone": "Professional"},
+    ]
+    jobs_path, out_path = tmp_path / "jobs.jsonl", tmp_path / "results.jsonl"
+    jobs_path.write_text("\n".join(json.dumps(job) for job in jobs), encoding="utf-8")
+
+    rewrite_post = batch.rewrite_post
+
+    def flaky_rewrite(text, *args, **kwargs):
+        if text == "Boom":
+            raise RuntimeError("boom")
+        return rewrite_post(text, *args, **kwargs)
+
+    monkeypatch.setattr(batch, "rewrite_post", flaky_rewrite)
+    summary = batch.run_batch(str(jobs_path), str(out_path), concurrency=2)
+
+    records = {record["id"]: record for record in batch.read_jsonl(out_path)}
+    assert records["ok"]["status"] == "ok"
+    assert records["no-tag"]["output"] == "Error: missing tag"
+    assert records["odd-type"]["output"] == "Error: unknown job type 'translate'"
+    assert records["raises"]["status"] == "error"
+    assert summary["jobs_run"] == 2 and summary["invalid"] == 2 and summary["failed"] == 3
+
+
+def test_malformed_lines_and_empty_answers_are_errors_and_resume_retries_them(tmp_path, fake_llm):
+    fake = fake_llm(lambda prompt: "I'm not sure what to write.")
+    job = {"id": "empty", "tag": "Career", "length": "Short", "language": "English", "tone": "Professional"}
+    jobs_path, out_path = tmp_path / "jobs.jsonl", tmp_path / "results.jsonl"
+    jobs_path.write_text(json.dumps(job) + "\n{not json\n", encoding="utf-8")
+
+    summary = batch.run_batch(str(jobs_path), str(out_path), use_cache=False)
+    records = batch.read_jsonl(out_path)
+    assert [record["status"] for record in records] == ["error", "error"]
+    assert records[0]["output"].startswith("Error: line 2 is not valid JSON")
+    assert records[1]["id"] == "empty" and records[1]["posts"] == []
+    assert summary["failed"] == 2
+
+    calls = fake.calls
+    batch.run_batch(str(jobs_path), str(out_path), use_cache=False)
+    assert fake.calls == calls + 1
@@ -0,0 +1,16 @@
+from favorites_store import FavoritesStore
+
+
+def test_favorites_are_scoped_to_their_owner(tmp_path):
+    store = FavoritesStore(str(tmp_path / "favorites.sqlite3"))
+    store.add("Shipping my first product #launch", topic="Career", owner="alice")
+    store.add("Lessons from a product launch", topic="Leadership", owner="bob")
+
+    favorites, total = store.query("launch", owner="alice")
+    assert total == 1 and favorites[0]["post"].startswith("Shipping")
+    assert store.topics("alice") == ["Career"]
+
+    store.clear(owner="alice")
+    assert store.count("alice") == 0
+    assert store.count("bob") == 1
+    assert store.query("launch", owner="bob")[1] == 1
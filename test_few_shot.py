@@ -0,0 +1,30 @@
+import json
+
+from dedup import DedupIndex
+from few_shot import FewShotPosts, dedup_dir_for, file_fingerprint
+
+POSTS = [
+    {"text": "Landed my first data engineering role after six months of applications", "language": "English",
+     "line_count": 3, "tags": ["Job Search"]},
+    {"text": "Three lessons from mentoring junior developers this year", "language": "English",
+     "line_count": 7, "tags": ["Mentorship"]},
+]
+
+
+def write_corpus(path, posts):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(posts, f)
+
+
+def test_saved_index_is_reused_until_the_corpus_file_changes(tmp_path, capsys):
+    path = str(tmp_path / "posts.json")
+    write_corpus(path, POSTS)
+    DedupIndex.build([post["text"] for post in POSTS], file_fingerprint(path)[1]).save(dedup_dir_for(path))
+
+    assert FewShotPosts(path).find_near_duplicates(POSTS[0]["text"])
+    assert "stale" not in capsys.readouterr().out
+
+    write_corpus(path, POSTS[::-1])
+    fs = FewShotPosts(path)
+    assert fs.find_near_duplicates(POSTS[0]["text"])[0][0]["text"] == POSTS[0]["text"]
+    assert "missing or stale" in capsys.readouterr().out
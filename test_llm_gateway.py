@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_llm import FakeLLM, FakeLLMError
+from llm_gateway import AllModelsUnavailable, LLMGateway
+
+COOLDOWN = 0.05
+
+
+def make_gateway():
+    primary = FakeLLM(responder=lambda prompt: "primary", model_name="primary")
+    fallback = FakeLLM(responder=lambda prompt: "fallback", model_name="fallback")
+    gateway = LLMGateway([("primary", primary), ("fallback", fallback)], retries=0, base_delay=0.001,
+                         breaker_threshold=1, breaker_cooldown=COOLDOWN)
+    return gateway, primary, fallback
+
+
+def set_down(model, down):
+    model.error_rate = 1.0 if down else 0.0
+
+
+def test_fails_over_when_primary_errors():
+    gateway, primary, fallback = make_gateway()
+    set_down(primary, True)
+    assert gateway.invoke("hi").content == "fallback"
+    assert gateway.breakers["primary"].state == "open"
+    assert gateway.breakers["fallback"].state == "closed"
+    assert gateway.stats["failovers"] == 1
+
+
+def test_recovered_primary_does_not_strand_fallback_trial():
+    gateway, primary, fallback = make_gateway()
+    set_down(primary, True)
+    set_down(fallback, True)
+    with pytest.raises(FakeLLMError):
+        gateway.invoke("hi")
+    assert gateway.breakers["primary"].state == "open"
+    assert gateway.breakers["fallback"].state == "open"
+
+    # Both half-open; the primary's trial succeeds, so the fallback is never asked
+    time.sleep(COOLDOWN * 1.5)
+    set_down(primary, False)
+    set_down(fallback, False)
+    fallback_calls = fallback.calls
+    assert gateway.invoke("hi").content == "primary"
+    assert gateway.breakers["primary"].state == "closed"
+    assert fallback.calls == fallback_calls
+
+    # The fallback's half-open trial must still be available when the primary fails again
+    set_down(primary, True)
+    assert gateway.invoke("hi").content == "fallback"
+    assert gateway.breakers["fallback"].state == "closed"
+
+
+def test_open_circuits_raise_all_models_unavailable():
+    gateway, primary, fallback = make_gateway()
+    set_down(primary, True)
+    set_down(fallback, True)
+    with pytest.raises(FakeLLMError):
+        gateway.invoke("hi")
+    calls = primary.calls + fallback.calls
+    with pytest.raises(AllModelsUnavailable):
+        gateway.invoke("hi")
+    assert primary.calls + fallback.calls == calls
+    assert gateway.stats["circuit_skips"] == 2
+
+
+def test_non_retryable_error_is_raised_without_opening_circuit():
+    gateway, primary, fallback = make_gateway()
+
+    def bad_request(prompt):
+        raise FakeLLMError("Bad request", status_code=400)
+
+    primary.responder = bad_request
+    with pytest.raises(FakeLLMError, match="Bad request"):
+        gateway.invoke("hi")
+    assert gateway.breakers["primary"].state == "closed"
+    assert fallback.calls == 0
+
+
+def test_abandoned_half_open_trial_expires():
+    gateway, primary, fallback = make_gateway()
+    breaker = gateway.breakers["primary"]
+    breaker.record_failure()
+    time.sleep(COOLDOWN * 1.5)
+    assert breaker.allow()
+    assert not breaker.allow()
+    # The trial call never reported back (e.g. it was cancelled); it expires after a cooldown
+    time.sleep(COOLDOWN * 1.5)
+    assert breaker.allow()
+
+
+def test_async_and_streaming_fail_over():
+    gateway, primary, fallback = make_gateway()
+    set_down(primary, True)
+    assert "".join(chunk.content for chunk in gateway.stream("hi")) == "fallback"
+
+    async def astream_text():
+        return "".join([chunk.content async for chunk in gateway.astream("hi")])
+
+    time.sleep(COOLDOWN * 1.5)
+    assert asyncio.run(gateway.ainvoke("hi")).content == "fallback"
+    time.sleep(COOLDOWN * 1.5)
+    assert asyncio.run(astream_text()) == "fallback"
+    assert gateway.breakers["fallback"].state == "closed"
+
+
+def test_with_limits_rate_limits_every_attempt_and_shares_breakers():
+    gateway, primary, fallback = make_gateway()
+    set_down(primary, True)
+
+    class CountingLimiter:
+        acquired = 0
+
+        def acquire(self):
+            self.acquired += 1
+
+    limiter = CountingLimiter()
+    limited = gateway.with_limits(retries=2, rate_limiter=limiter)
+    assert limited.invoke("hi").content == "fallback"
+    assert primary.calls == 3 and fallback.calls == 1
+    assert limiter.acquired == 4
+    assert gateway.retries == 0 and gateway.rate_limiter is None
+    assert gateway.breakers["primary"].state == "open"
+    assert gateway.retry_after() == 0
+
+    set_down(fallback, True)
+    with pytest.raises(FakeLLMError):
+        limited.invoke("hi")
+    assert 0 < gateway.retry_after() <= COOLDOWN
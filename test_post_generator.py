@@ -0,0 +1,45 @@
+import pytest
+
+import llm_helper
+import post_generator
+
+
+@pytest.fixture
+def fake(fake_llm):
+    return fake_llm(lambda prompt: f"Post 1:\nA post written for prompt {len(prompt)}\nImage Idea 1: A desk\n#Career")
+
+
+def test_fanout_reports_cached_variants(fake):
+    args = ("Short", "English", "Job Search", "Professional")
+    first, second = set(), set()
+    list(post_generator.generate_posts_fanout(*args, reused=first))
+    list(post_generator.generate_posts_fanout(*args, reused=second))
+    assert first == set() and second == {0, 1, 2}
+
+
+def test_stream_timings_mark_cached_output(fake):
+    prompt = "Tips for a first job interview"
+    timings = {}
+    text = "".join(llm_helper.stream_complete(prompt, timings=timings))
+    assert timings["cached"] is False and timings["coalesced"] is False
+    "".join(llm_helper.stream_complete(prompt, timings=timings))
+    assert timings["cached"] is True
+
+    assert post_generator.check_originality(text)["recent_similarity"] < post_generator.COPY_THRESHOLD
+    assert post_generator.check_originality(text, check_recent=False)["recent_similarity"] == 0.0
+
+
+def test_fresh_fanout_does_not_pin_a_seed(fake, monkeypatch):
+    params = []
+    complete = post_generator.complete
+
+    def recording_complete(prompt, **kwargs):
+        params.append(kwargs)
+        return complete(prompt, **kwargs)
+
+    monkeypatch.setattr(post_generator, "complete", recording_complete)
+    args = ("Short", "English", "Job Search", "Professional")
+    list(post_generator.generate_posts_fanout(*args))
+    list(post_generator.generate_posts_fanout(*args, use_cache=False))
+    assert sorted(p["seed"] for p in params[:3]) == [0, 1, 2]
+    assert not any("seed" in p for p in params[3:])
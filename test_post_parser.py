@@ -0,0 +1,26 @@
+from post_parser import PostStreamParser, parse_posts
+
+RAW = (
+    "Post 1: Great week\nLearned a lot\nImage Idea 1: A sunrise #Career #Growth\n\n"
+    "Post 2: Another one\nImage Idea 2: A desk with a #1 mug on it\n#Work\n"
+    "Post 3: Third\nImage Idea 3: Two people\nshaking hands #Deal\n#Extra"
+)
+
+
+def test_hashtags_on_the_image_idea_line_are_split_off():
+    posts, issues = parse_posts(RAW)
+    assert posts == [
+        ("Great week\nLearned a lot", "A sunrise", "#Career #Growth"),
+        ("Another one", "A desk with a #1 mug on it", "#Work"),
+        ("Third", "Two people\nshaking hands", "#Deal\n#Extra"),
+    ]
+    assert issues == []
+
+
+def test_streamed_chunks_parse_the_same():
+    parser = PostStreamParser(max_posts=3)
+    posts = []
+    for i in range(0, len(RAW), 7):
+        posts.extend(parser.feed(RAW[i:i + 7]))
+    posts.extend(parser.close())
+    assert posts == parse_posts(RAW)[0]
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import preprocess
+
+
+@pytest.fixture
+def unify_llm(fake_llm):
+    """Answer unify prompts by mapping every tag to itself."""
+    def responder(prompt):
+        tags = prompt.rsplit("Tags:", 1)[-1].strip().split(", ")
+        return json.dumps({tag: tag for tag in tags})
+
+    return fake_llm(responder)
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("#JobSearches", "job search"),
+    ("IoT", "iot"),
+    ("IOT", "iot"),
+    ("IoTDevices", "iot device"),
+    ("AIEthics", "ai ethic"),
+])
+def test_normalize_tag_keeps_acronyms_whole(tag, expected):
+    assert preprocess.normalize_tag(tag) == expected
+
+
+@pytest.mark.parametrize("variants, expected", [
+    (["AI", "ai", "AI"], "AI"),
+    (["LinkedIn"], "LinkedIn"),
+    (["#SaaS"], "SaaS"),
+    (["job search", "job search", "Job Search"], "Job Search"),
+    (["career AI tips"], "Career AI Tips"),
+])
+def test_canonical_tag_keeps_original_spelling(variants, expected):
+    assert preprocess.canonical_tag(variants) == expected
+
+
+def test_unified_tags_keep_original_spelling_when_echoed(unify_llm):
+    posts = [{"tags": ["IoT", "LinkedIn"]}, {"tags": ["IoT", "SaaS"]}, {"tags": ["IOT"]}]
+    unified = preprocess.get_unified_tags(posts)
+    assert unified == {"IoT": "IoT", "IOT": "IoT", "LinkedIn": "LinkedIn", "SaaS": "SaaS"}
+
+
+def test_unified_tags_with_shared_canonical_spelling(unify_llm, monkeypatch):
+    # Force two clusters whose canonical spelling is the same ("Iot")
+    monkeypatch.setattr(preprocess, "cluster_tags", lambda tags: {"io t": ["iot"], "iot": ["Iot"]})
+    unified = preprocess.get_unified_tags([{"tags": ["iot"]}, {"tags": ["Iot"]}])
+    assert unified == {"iot": "Iot", "Iot": "Iot"}
+    assert unify_llm.calls == 1
+
+
+def test_posts_whose_tags_cannot_be_parsed_are_not_checkpointed(tmp_path, fake_llm):
+    def responder(prompt):
+        if "Posts:" not in prompt:
+            tags = prompt.rsplit("Tags:", 1)[-1].strip().split(", ")
+            return json.dumps({tag: tag for tag in tags})
+        posts = json.loads(prompt.split("Posts:", 1)[1])
+        return json.dumps([{"id": post["id"], "tags": ["Career"]} for post in posts if "garbled" not in post["post"]])
+
+    fake = fake_llm(responder)
+    raw_path, checkpoint_path = tmp_path / "raw.json", tmp_path / "checkpoint.jsonl"
+    raw_path.write_text(json.dumps([
+        {"text": "Landed my first job in data engineering after a year of learning.", "engagement": 10},
+        {"text": "This one always comes back garbled from the model, sadly.", "engagement": 5},
+    ]), encoding="utf-8")
+
+    def run():
+        preprocess.process_posts(str(raw_path), str(tmp_path / "processed.json"), retries=0,
+                                 checkpoint_path=str(checkpoint_path), resume=True)
+
+    run()
+    assert len(preprocess.CheckpointStore.load(str(checkpoint_path))) == 1
+    calls = fake.calls
+    run()
+    # Only the untagged post is asked about again (one tag call, one unify call)
+    assert fake.calls == calls + 2
@@ -0,0 +1,18 @@
+import itertools
+
+from post_generator import generate_post
+from prewarm import Prewarmer
+
+
+def test_pooled_result_is_not_served_again_from_the_cache(fake_llm):
+    bodies = itertools.count()
+    fake_llm(lambda prompt: f"Post 1:\nUnique body {next(bodies)}\nImage Idea 1: A desk\n#Career")
+    prewarmer = Prewarmer(calls_per_hour=10, pool_size=1, min_requests=1, is_valid=lambda *args: True)
+    combo = ("Short", "English", "Job Search", "Professional")
+
+    assert prewarmer.take(*combo) is None
+    assert prewarmer.refill_once()
+    pooled = prewarmer.take(*combo)
+    assert "Unique body 0" in pooled
+    assert prewarmer.take(*combo) is None
+    assert generate_post(*combo) != pooled
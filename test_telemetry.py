@@ -0,0 +1,11 @@
+from telemetry import Telemetry
+
+
+def test_prometheus_counters_keep_full_precision():
+    telemetry = Telemetry()
+    telemetry.increment("tokens_total", 1234567)
+    telemetry.increment("cost_dollars_total", 0.1)
+    telemetry.increment("cost_dollars_total", 1234.5)
+    lines = telemetry.prometheus().splitlines()
+    assert "tokens_total 1234567" in lines
+    assert "cost_dollars_total 1234.6" in lines